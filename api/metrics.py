@@ -3,6 +3,20 @@ import numpy as np
 from sqlalchemy.orm.session import Session
 
 MORTGAGE_CONTRIBUTION = 850
+WORKDAY_EATING_OUT_CATEGORIES = frozenset({"OVATION_WEEKDAY", "EATING_OUT_NBHD_LUNCH"})
+# low cardinality text columns of the marts tables, dictionary encoded when read
+MART_CATEGORICAL_COLUMNS = ("category", "meta_category", "source")
+
+
+def read_mart_table(db: Session, table_name: str) -> pd.DataFrame:
+    """
+    Read a marts table with its low cardinality text columns as categoricals, so the
+    filters and groupbys below compare integer codes instead of strings.
+    """
+    df = pd.read_sql(f"""SELECT * FROM {table_name}""", db.connection())
+    return df.astype(
+        {column: "category" for column in MART_CATEGORICAL_COLUMNS if column in df}
+    )
 
 
 def determine_last_X_months_from_dataset(
@@ -80,6 +94,28 @@ def subset_data_by_period(
     return data
 
 
+def sum_amount_by_month(df: pd.DataFrame, name: str, sort: bool = True) -> pd.DataFrame:
+    """
+    Total transaction amounts for each year_month into a column called name, in
+    ascending month order unless sort is False.
+
+    Months are factorized into integer codes and summed with np.bincount, which avoids the
+    overhead of a general groupby for this single key reduction.
+    """
+    codes, months = pd.factorize(df["year_month"], sort=sort)
+    amounts = df["amount"].fillna(0).to_numpy(dtype=float)
+    has_month = codes >= 0
+
+    return pd.DataFrame(
+        {
+            "year_month": months,
+            name: np.bincount(
+                codes[has_month], weights=amounts[has_month], minlength=len(months)
+            ),
+        }
+    )
+
+
 def calculate_average_monthly_spending_by_meta_category(
     db: Session, period: str = "full_history", include_wedding: bool = True
 ) -> pd.DataFrame:
@@ -87,12 +123,14 @@ def calculate_average_monthly_spending_by_meta_category(
     View of average monthly spending patterns.
     """
     data = (
-        pd.read_sql("""SELECT * FROM marts_spending""", db.connection())
+        read_mart_table(db, "marts_spending")
         .pipe(subset_data_by_period, period)
         .pipe(include_wedding_spending, include_wedding)
     )
 
-    monthly_data = data.groupby(["year_month", "meta_category"], as_index=False).agg(
+    monthly_data = data.groupby(
+        ["year_month", "meta_category"], as_index=False, sort=False, observed=True
+    ).agg(
         total_spend=("amount", "sum"),
         monthly_transactions=("amount", "count"),
     )
@@ -100,7 +138,9 @@ def calculate_average_monthly_spending_by_meta_category(
     number_of_months = monthly_data["year_month"].unique().shape[0]
 
     return (
-        monthly_data.groupby(["meta_category"], as_index=False)
+        monthly_data.groupby(
+            ["meta_category"], as_index=False, sort=False, observed=True
+        )
         .agg(
             total_spend=("total_spend", "sum"),
             avg_monthly_transactions=("monthly_transactions", "mean"),
@@ -137,11 +177,10 @@ def calculate_monthly_spending(
     db: Session, period: str = "full_history", include_wedding: bool = True
 ) -> pd.DataFrame:
     return (
-        pd.read_sql("""SELECT * FROM marts_spending""", db.connection())
+        read_mart_table(db, "marts_spending")
         .pipe(subset_data_by_period, period)
         .pipe(include_wedding_spending, include_wedding)
-        .groupby(["year_month"], as_index=False)
-        .agg(monthly_spending=("amount", "sum"))
+        .pipe(sum_amount_by_month, "monthly_spending")
     )
 
 
@@ -150,11 +189,11 @@ def calculate_monthly_saving(db: Session, period: str = "full_history") -> pd.Da
     Calculate savings per month over inputed time period
     """
     return (
-        pd.read_sql("""SELECT * FROM marts_savings""", db.connection())
+        read_mart_table(db, "marts_savings")
         .pipe(subset_data_by_period, period)
+        .pipe(sum_amount_by_month, "monthly_savings")
         .assign(year_month=lambda df_: pd.to_datetime(df_["year_month"]))
-        .groupby(["year_month"])
-        .agg(monthly_savings=("amount", "sum"))
+        .set_index("year_month")
         .pipe(
             lambda df_: df_.reindex(
                 pd.date_range(start=df_.index.min(), end=df_.index.max(), freq="MS"),
@@ -182,11 +221,10 @@ def calculate_monthly_salary(db: Session, period: str = "full_history") -> pd.Da
     Calculate my monthly salary income for the given time period.
     """
     return (
-        pd.read_sql("""SELECT * FROM marts_income""", db.connection())
+        read_mart_table(db, "marts_income")
         .pipe(subset_data_by_period, period)
         .loc[lambda df_: df_["category"] == "SALARY"]
-        .groupby(["year_month"], as_index=False)
-        .agg(monthly_salary=("amount", "sum"))
+        .pipe(sum_amount_by_month, "monthly_salary")
     )
 
 
@@ -254,8 +292,10 @@ def calculate_monthly_budget_history(
         calculate_monthly_spending(db, period, include_wedding)
         .merge(calculate_monthly_salary(db, period), how="left")
         .merge(calculate_monthly_saving(db, period), how="left")
-        .fillna(0) # avoid NaN when no savings in a given month
-        .assign(cumulative_savings=lambda df_: df_["monthly_savings"].cumsum())
+        .fillna(0)  # avoid NaN when no savings in a given month
+        .assign(
+            cumulative_savings=lambda df_: np.cumsum(df_["monthly_savings"].to_numpy())
+        )
     )
 
 
@@ -266,20 +306,18 @@ def calculate_average_monthly_spend_eating_out_by_category(
     For each month calculate the average spending by subcategory in the EATING_OUT meta category.
     """
     return (
-        pd.read_sql("""SELECT * FROM marts_spending""", db.connection())
+        read_mart_table(db, "marts_spending")
         .pipe(subset_data_by_period, period)
         .loc[lambda df_: df_["meta_category"] == "EATING_OUT"]
-        .groupby(["year_month", "category"], as_index=False)
+        .groupby(["year_month", "category"], as_index=False, sort=False, observed=True)
         .agg(amount=("amount", "sum"))
-        .pivot_table(index="year_month", columns="category", values="amount")
+        .pivot_table(
+            index="year_month", columns="category", values="amount", observed=True
+        )
         .fillna(0)
         .mean()
         .to_frame(name="amount")
         .sort_values("amount", ascending=True)
         .reset_index(drop=False)
-        .assign(
-            WORKDAY=lambda df_: df_["category"].isin(
-                ["OVATION_WEEKDAY", "EATING_OUT_NBHD_LUNCH"]
-            )
-        )
+        .assign(WORKDAY=lambda df_: df_["category"].isin(WORKDAY_EATING_OUT_CATEGORIES))
     )
@@ -1,65 +1,107 @@
+from collections.abc import Callable, Iterable
+import functools
 import pandas as pd
 import numpy as np
-from etl.database import get_db
+from sqlalchemy.orm import Session
+from etl.database import get_db, run_builders, session_scope, write_table
 
 
 # Parameters
-INCOME_CATEGORIES = [
-    "SALARY",
-    "CASH_DEPOSIT",
-    "TAX_REFUND",
-    "ACCOUNT_INTEREST",
-    "PORTLAND_ARTS_TAX",
-    "FILING_TAXES",
-    "VENMO_CASHOUT",
-]
-SAVINGS_CATEGORIES = ["TRANSFER_TO_BROKERAGE", "TRANSFER_FROM_BROKERAGE"]
+INCOME_CATEGORIES = frozenset(
+    {
+        "SALARY",
+        "CASH_DEPOSIT",
+        "TAX_REFUND",
+        "ACCOUNT_INTEREST",
+        "PORTLAND_ARTS_TAX",
+        "FILING_TAXES",
+        "VENMO_CASHOUT",
+    }
+)
+SAVINGS_CATEGORIES = frozenset({"TRANSFER_TO_BROKERAGE", "TRANSFER_FROM_BROKERAGE"})
+# Transfers between accounts and card payments would double count the underlying spending
+BANK_ACCOUNT_EXCLUDED_CATEGORIES = frozenset(
+    {"TRANSFER_BETWEEN_CHASE_ACCOUNTS", "CREDIT_CARD_PAYMENT"}
+)
+CREDIT_CARD_EXCLUDED_CATEGORIES = frozenset({"CREDIT_CARD_PAYMENT"})
 
 
-def _prepare_bank_account_tx_for_union(df: pd.DataFrame) -> pd.DataFrame:
+def _prepare_for_union(
+    df: pd.DataFrame,
+    *,
+    account_column: str,
+    source: str,
+    excluded: frozenset[str],
+    dropped: Iterable[str],
+) -> pd.DataFrame:
+    """Filter and project a staging table in one pass into the shared union layout"""
+    dropped = {"source_file", "imported_at", *dropped}
+    columns = [column for column in df.columns if column not in dropped]
     return (
-        df.loc[
-            ~df["category"].isin(
-                ["TRANSFER_BETWEEN_CHASE_ACCOUNTS", "CREDIT_CARD_PAYMENT"]
-            )
-        ]
-        .drop(["balance", "source_file", "imported_at"], axis=1)
-        .rename(columns={"account": "account_or_card_number"})
-        .assign(source="bank_account")
+        df.loc[~df["category"].isin(excluded).to_numpy(), columns]
+        .rename(columns={account_column: "account_or_card_number"})
+        .assign(source=source)
+    )
+
+
+def _prepare_bank_account_tx_for_union(df: pd.DataFrame) -> pd.DataFrame:
+    return _prepare_for_union(
+        df,
+        account_column="account",
+        source="bank_account",
+        excluded=BANK_ACCOUNT_EXCLUDED_CATEGORIES,
+        dropped=("balance",),
     )
 
 
 def _prepare_credit_card_tx_for_union(df: pd.DataFrame) -> pd.DataFrame:
-    return (
-        df.loc[~df["category"].isin(["CREDIT_CARD_PAYMENT"])]
-        .drop(["chase_category", "source_file", "imported_at"], axis=1)
-        .rename(columns={"card_number": "account_or_card_number"})
-        .assign(source="credit_card")
+    return _prepare_for_union(
+        df,
+        account_column="card_number",
+        source="credit_card",
+        excluded=CREDIT_CARD_EXCLUDED_CATEGORIES,
+        dropped=("chase_category",),
     )
 
 
-def create_unified_transactions() -> pd.DataFrame:
+def create_unified_transactions(db: Session | None = None) -> pd.DataFrame:
     staging_bank_acc_tx_query = """SELECT * FROM staging_bank_account_transactions"""
     staging_cc_tx_query = """SELECT * FROM staging_credit_card_transactions"""
 
-    bank_account = pd.read_sql(staging_bank_acc_tx_query, get_db().connection()).pipe(
+    connection = (db if db is not None else get_db()).connection()
+
+    bank_account = pd.read_sql(staging_bank_acc_tx_query, connection).pipe(
         _prepare_bank_account_tx_for_union
     )
 
-    credit_card = pd.read_sql(staging_cc_tx_query, get_db().connection()).pipe(
+    credit_card = pd.read_sql(staging_cc_tx_query, connection).pipe(
         _prepare_credit_card_tx_for_union
     )
 
     unified_transactions = pd.concat([credit_card, bank_account], axis=0)
 
-    return unified_transactions
+    # low cardinality string columns are dictionary encoded so downstream filters
+    # and meta category assignment operate on integer codes instead of strings
+    return unified_transactions.astype({"source": "category", "category": "category"})
+
+
+def partition_transactions_on_savings(
+    df: pd.DataFrame,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Split transactions into (savings, non savings) with a single category scan"""
+    is_savings = df["category"].isin(SAVINGS_CATEGORIES).to_numpy()
+    return _select_savings(df, is_savings), df.loc[~is_savings]
+
+
+def _select_savings(df: pd.DataFrame, is_savings: np.ndarray) -> pd.DataFrame:
+    # transfer to brokerage is a deduction from bank account but increase in savings,
+    # so the sign is flipped on the selected numpy slice rather than a second frame
+    return df.loc[is_savings].assign(amount=-df["amount"].to_numpy()[is_savings])
 
 
 def subset_transactions_on_savings(df: pd.DataFrame) -> pd.DataFrame:
     """Savings are defined as transfers to/from investment accounts"""
-    return df.loc[df["category"].isin(SAVINGS_CATEGORIES)].assign(
-        amount=lambda df_: df_["amount"] * -1
-    )  # transfer to brokerage is a deduction from bank account but increase in savings
+    return _select_savings(df, df["category"].isin(SAVINGS_CATEGORIES).to_numpy())
 
 
 def drop_savings_from_tx_tbl(df: pd.DataFrame) -> pd.DataFrame:
@@ -72,9 +114,16 @@ def drop_income_from_tx_tbl(df: pd.DataFrame) -> pd.DataFrame:
     return df.loc[~df["category"].isin(INCOME_CATEGORIES)]
 
 
-def assign_categories_to_meta_categories(df: pd.DataFrame) -> pd.DataFrame:
-    """Group categories together into concepts for easier analysis"""
-    subscriptions = [
+# Meta categories in priority order, a category is assigned to the first meta category listing it
+META_CATEGORIES = {
+    "HOUSING": ["MORTGAGE_PAYMENT", "HOA_PAYMENT"],
+    "WEDDING": [
+        "JENNA_WEDDING_ACCT_TRANSFERS",
+        "WEDDING_PHOTOGRAPHER",
+        "WEDDING",
+        "CASH_WITHDRAWL_FOR_WEDDING",
+    ],
+    "ENTERTAINMENT_SUBSCRIPTIONS": [
         "PODCAST_SUBSCRIPTION",
         "HBO_SUBSCRIPTION",
         "SPOTIFY_MEMBERSHIP",
@@ -87,168 +136,174 @@ def assign_categories_to_meta_categories(df: pd.DataFrame) -> pd.DataFrame:
         "PEACOCK_SUBSCRIPTION",
         "VIDEO_GAMES",
         "APPLE_TV_SUBSCRIPTION",
-    ]
-
-    return df.assign(
-        meta_category=np.select(
-            [
-                df["category"].isin(["MORTGAGE_PAYMENT", "HOA_PAYMENT"]),
-                df["category"].isin(
-                    [
-                        "JENNA_WEDDING_ACCT_TRANSFERS",
-                        "WEDDING_PHOTOGRAPHER",
-                        "WEDDING",
-                        "CASH_WITHDRAWL_FOR_WEDDING",
-                    ]
-                ),
-                df["category"].isin(subscriptions),
-                df["category"].isin(
-                    [
-                        "SALARY",
-                        "CASH_DEPOSIT",
-                        "TAX_REFUND",
-                        "ACCOUNT_INTEREST",
-                        "PORTLAND_ARTS_TAX",
-                        "FILING_TAXES",
-                    ]
-                ),
-                df["category"].isin(["CASH_WITHDRAWL"]),
-                df["category"].isin(
-                    ["CAR_INSURANCE", "DIAMOND_INSURANCE", "COBRA_PAYMENTS"]
-                ),
-                df["category"].isin(["CELL_PHONE_BILL", "COMCAST", "PGE", "HAIRCUT"]),
-                df["category"].isin(
-                    [
-                        "FAST_FOOD",
-                        "OVATION_WEEKEND",
-                        "EATING_OUT_NBHD_LUNCH",
-                        "OVATION_WEEKDAY",
-                        "EATING_OUT",
-                        "DOMINOS",
-                        "OTHER_COFFEE_SHOPS",
-                        "NBHD_BARS",
-                    ]
-                ),
-                df["category"] == "GROCERIES",
-                df["category"].isin(
-                    [
-                        "RIDESHARE",
-                        "TRAVEL_LODGING",
-                        "PARKING",
-                        "FLIGHTS",
-                        "OTHER_TRANSPORTATION",
-                        "PASSPORT_RENEWAL",
-                    ]
-                ),
-                df["category"].isin(["VOD_AMAZON", "MOVIES"]),
-                df["category"].isin(["PHYSICAL_MEDIA", "POWELLS", "MTG"]),
-                df["category"].isin(["CONCERTS", "RODEO", "MODA_CENTER"]),
-                df["category"].isin(["LIQUOR_STORE"]),
-                df["category"].isin(["GYM_MEMBERSHIP", "INDOOR_SOCCER", "SURFING"]),
-                df["category"].isin(["CLOTHES", "ARSENAL", "DRY_CLEANING"]),
-                df["category"].isin(["GAS", "CAR_MAINTENANCE"]),
-                df["category"].isin(["VENMO_PAYMENT"]),
-                df["category"].isin(
-                    ["HOSTING_SOFTWARE_PROJECTS", "COMPUTERS_TECHNOLOGY_HARDWARE"]
-                ),
-                df["category"] == "AMAZON_PURCHASE",
-            ],
-            [
-                "HOUSING",
-                "WEDDING",
-                "ENTERTAINMENT_SUBSCRIPTIONS",
-                "INCOME",
-                "CASH_WITHDRAWL",
-                "INSURANCE",
-                "UTILITIES",
-                "EATING_OUT",
-                "GROCERIES",
-                "TRAVEL",
-                "MOVIES",
-                "HOBBY_PHYSICAL_MEDIA",
-                "CONCERTS_AND_SPORTING_EVENTS",
-                "HOBBY_COCKTAILS",
-                "HOBBY_SPORTS",
-                "CLOTHES",
-                "CAR",
-                "VENMO",
-                "HOBBY_TECH",
-                "AMAZON_SPENDING",
-            ],
-            default="OTHER",
-        )
+    ],
+    "INCOME": [
+        "SALARY",
+        "CASH_DEPOSIT",
+        "TAX_REFUND",
+        "ACCOUNT_INTEREST",
+        "PORTLAND_ARTS_TAX",
+        "FILING_TAXES",
+    ],
+    "CASH_WITHDRAWL": ["CASH_WITHDRAWL"],
+    "INSURANCE": ["CAR_INSURANCE", "DIAMOND_INSURANCE", "COBRA_PAYMENTS"],
+    "UTILITIES": ["CELL_PHONE_BILL", "COMCAST", "PGE", "HAIRCUT"],
+    "EATING_OUT": [
+        "FAST_FOOD",
+        "OVATION_WEEKEND",
+        "EATING_OUT_NBHD_LUNCH",
+        "OVATION_WEEKDAY",
+        "EATING_OUT",
+        "DOMINOS",
+        "OTHER_COFFEE_SHOPS",
+        "NBHD_BARS",
+    ],
+    "GROCERIES": ["GROCERIES"],
+    "TRAVEL": [
+        "RIDESHARE",
+        "TRAVEL_LODGING",
+        "PARKING",
+        "FLIGHTS",
+        "OTHER_TRANSPORTATION",
+        "PASSPORT_RENEWAL",
+    ],
+    "MOVIES": ["VOD_AMAZON", "MOVIES"],
+    "HOBBY_PHYSICAL_MEDIA": ["PHYSICAL_MEDIA", "POWELLS", "MTG"],
+    "CONCERTS_AND_SPORTING_EVENTS": ["CONCERTS", "RODEO", "MODA_CENTER"],
+    "HOBBY_COCKTAILS": ["LIQUOR_STORE"],
+    "HOBBY_SPORTS": ["GYM_MEMBERSHIP", "INDOOR_SOCCER", "SURFING"],
+    "CLOTHES": ["CLOTHES", "ARSENAL", "DRY_CLEANING"],
+    "CAR": ["GAS", "CAR_MAINTENANCE"],
+    "VENMO": ["VENMO_PAYMENT"],
+    "HOBBY_TECH": ["HOSTING_SOFTWARE_PROJECTS", "COMPUTERS_TECHNOLOGY_HARDWARE"],
+    "AMAZON_SPENDING": ["AMAZON_PURCHASE"],
+}
+DEFAULT_META_CATEGORY = "OTHER"
+
+_CATEGORY_TO_META_CATEGORY: dict[str, str] = {}
+for _meta_category, _categories in META_CATEGORIES.items():
+    for _category in _categories:
+        _CATEGORY_TO_META_CATEGORY.setdefault(_category, _meta_category)
+
+
+def assign_categories_to_meta_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Group categories together into concepts for easier analysis"""
+    # resolve each distinct category once, then gather by integer code for every row
+    category = df["category"].astype("category")
+    lookup = np.array(
+        [
+            _CATEGORY_TO_META_CATEGORY.get(c, DEFAULT_META_CATEGORY)
+            for c in category.cat.categories
+        ]
+        + [DEFAULT_META_CATEGORY],  # missing categories have code -1
+        dtype=object,
     )
 
+    return df.assign(meta_category=lookup[category.cat.codes.to_numpy()])
+
 
 ## Create Tables in DB for cleaned Transactions, Spending, Income, Savings
-def create_transactions_tbl() -> None:
+def _copy_on_write(func: Callable[..., None]) -> Callable[..., None]:
+    """
+    Run a table builder with pandas copy-on-write, so its filtered and renamed frames share
+    buffers with their parent until written to. The option is restored on return instead
+    of being switched on for the whole process.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> None:
+        with pd.option_context("mode.copy_on_write", True):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+# (savings, non savings) halves of the unified transactions
+Partitions = tuple[pd.DataFrame, pd.DataFrame]
+
+
+def partition_unified_transactions(db: Session) -> Partitions:
+    """Read the unified transactions and split them into (savings, non savings)"""
+    return partition_transactions_on_savings(create_unified_transactions(db))
+
+
+@_copy_on_write
+def create_transactions_tbl(
+    partitions: Partitions | None = None, db: Session | None = None
+) -> None:
     """Clean transactions data with meta categories"""
-    db = get_db()
-    try:
-        (
-            create_unified_transactions()
-            .pipe(drop_savings_from_tx_tbl)
-            .pipe(assign_categories_to_meta_categories)
-            .to_sql(
-                "marts_transactions", db.connection(), if_exists="replace", index=False
-            )
+    with session_scope(db) as session:
+        if partitions is None:
+            partitions = partition_unified_transactions(session)
+        _, non_savings = partitions
+
+        write_table(
+            non_savings.pipe(assign_categories_to_meta_categories),
+            "marts_transactions",
+            session,
         )
-        db.commit()
-        print(f"✅ Created marts_transactions table")
-    finally:
-        db.close()
 
 
-def create_spending_tbl() -> None:
+@_copy_on_write
+def create_spending_tbl(
+    partitions: Partitions | None = None, db: Session | None = None
+) -> None:
     """
     Extract all spending by removing income and savings from transactions.
     """
-    db = get_db()
-    try:
-        (
-            create_unified_transactions()
-            .pipe(drop_savings_from_tx_tbl)
-            .pipe(drop_income_from_tx_tbl)
+    with session_scope(db) as session:
+        if partitions is None:
+            partitions = partition_unified_transactions(session)
+        _, non_savings = partitions
+
+        # spending is recorded as a deduction but for reporting we want it to be a positive value
+        spending = (
+            non_savings.pipe(drop_income_from_tx_tbl)
             .pipe(assign_categories_to_meta_categories)
-            # spending is recorded as a deduction but for reporting we want it to be a positive value
             .assign(amount=lambda df_: df_["amount"] * -1)
-            .to_sql("marts_spending", db.connection(), if_exists="replace", index=False)
         )
-        db.commit()
-        print(f"✅ Created marts_spending table")
-    finally:
-        db.close()
+        write_table(spending, "marts_spending", session)
 
 
-def create_income_tbl() -> None:
+@_copy_on_write
+def create_income_tbl(
+    partitions: Partitions | None = None, db: Session | None = None
+) -> None:
     """
     Extract all earnings (Salary, Venmo cash outs, tax refunds, cash deposits, etc.) from transactions table into
     separate income table
     """
-    db = get_db()
-    try:
-        (
-            create_unified_transactions()
-            .pipe(drop_savings_from_tx_tbl)
-            .loc[lambda df_: df_["category"].isin(INCOME_CATEGORIES)]
-            .to_sql("marts_income", db.connection(), if_exists="replace", index=False)
+    with session_scope(db) as session:
+        if partitions is None:
+            partitions = partition_unified_transactions(session)
+        _, non_savings = partitions
+
+        write_table(
+            non_savings.loc[lambda df_: df_["category"].isin(INCOME_CATEGORIES)],
+            "marts_income",
+            session,
         )
-        db.commit()
-        print(f"✅ Created marts_income table")
-    finally:
-        db.close()
 
 
-def create_savings_tbl() -> None:
+@_copy_on_write
+def create_savings_tbl(
+    partitions: Partitions | None = None, db: Session | None = None
+) -> None:
     """Savings (transfers to/from brokerage)"""
-    db = get_db()
-    try:
-        (
-            create_unified_transactions()
-            .pipe(subset_transactions_on_savings)
-            .to_sql("marts_savings", db.connection(), if_exists="replace", index=False)
-        )
-        db.commit()
-        print(f"✅ Created marts_savings table")
-    finally:
-        db.close()
+    with session_scope(db) as session:
+        if partitions is None:
+            partitions = partition_unified_transactions(session)
+        savings, _ = partitions
+
+        write_table(savings, "marts_savings", session)
+
+
+@_copy_on_write
+def build_all_marts(builders: Iterable[Callable[..., None]]) -> None:
+    """
+    Run the mart table builders on one shared session and commit them together, so the
+    marts layer costs a single connection and a single transaction. The staging tables
+    are read, unioned and partitioned once and the result is shared by every builder.
+    """
+    with session_scope() as db:
+        run_builders(builders, db, partitions=partition_unified_transactions(db))
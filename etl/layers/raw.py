@@ -1,8 +1,16 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+import csv
+import fnmatch
+import os
 import re
 import hashlib
 from pathlib import Path
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+from sqlalchemy import insert, select
 from etl.database import get_db
 from etl.types import AccountType, PathCSVDirectories
 from etl.schema import create_raw_schema
@@ -12,6 +20,46 @@ from etl.mappings import get_chase_bank_account_mapping, get_chase_credit_card_m
 # Create raw tables
 create_raw_schema()
 
+# Transaction and posting dates in both bank account and credit card exports
+CHASE_DATE_FORMAT = "%m/%d/%Y"
+# ids per IN (...) lookup, well under SQLite's bound parameter limit
+ID_LOOKUP_BATCH_SIZE = 500
+# Account number in a Chase export's file name, tried in order, compiled once at import
+CHASE_ACCOUNT_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"Chase\s*\d{4}",
+        r"Chase.*?ending\s+in\s+(\d{4})",
+        r"Chase.*?(\d{4})",
+    )
+]
+WHITESPACE = re.compile(r"\s+")
+
+
+def read_chase_csv(file_path: str, usecols: range | None = None) -> pd.DataFrame:
+    """
+    Parse CSV with pyarrow's multithreaded reader.
+
+    Chase bank exports end every data row with a trailing delimiter, so the header is padded
+    with placeholder names whenever the first data row is wider than the header.
+    """
+    # utf-8-sig drops the byte order mark Excel adds, which would prefix the first name
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        rows = csv.reader(f)
+        header = next(rows)
+        first_row = next(rows, header)
+
+    padding = [f"unnamed_{i}" for i in range(len(first_row) - len(header))]
+    include_columns = header if usecols is None else [header[i] for i in usecols]
+
+    return pa_csv.read_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(column_names=header + padding, skip_rows=1),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=include_columns, strings_can_be_null=True
+        ),
+    ).to_pandas()
+
 
 class CSVImporter(ABC):
     def __init__(self):
@@ -29,24 +77,64 @@ class CSVImporter(ABC):
 
     def _generate_id(self, row) -> str:
         """Generate unique ID for transaction"""
+        return self._hash_transaction(row["date"], row["amount"], row["description"])
+
+    @staticmethod
+    def _hash_transaction(date, amount, description) -> str:
         # Create hash from date + amount + description
-        content = f"{row['date']}{row['amount']}{str(row['description'])[:50]}"
+        content = f"{date}{amount}{str(description)[:50]}"
         return hashlib.md5(content.encode()).hexdigest()[:12]
 
-    def _extract_chase_account(self, file_path: str) -> str | None:
-        patterns = [
-            r"Chase\s*\d{4}",
-            r"Chase.*?ending\s+in\s+(\d{4})",
-            r"Chase.*?(\d{4})",
+    def _generate_ids(self, df: pd.DataFrame) -> list[str]:
+        """Generate the unique ID of every transaction in df"""
+        return [
+            self._hash_transaction(date, amount, description)
+            for date, amount, description in zip(
+                df["date"], df["amount"], df["description"]
+            )
         ]
 
-        for pattern in patterns:
-            match = re.search(pattern, file_path, re.IGNORECASE)
+    def _existing_ids(self, model: type[Base], ids: list[str]) -> set[str]:
+        """IDs already stored in model's table, looked up in batches instead of per row"""
+        existing: set[str] = set()
+        for start in range(0, len(ids), ID_LOOKUP_BATCH_SIZE):
+            batch = ids[start : start + ID_LOOKUP_BATCH_SIZE]
+            existing.update(
+                self.db.scalars(select(model.id).where(model.id.in_(batch)))
+            )
+        return existing
+
+    def _insert_records(self, model: type[Base], records: list[dict]) -> None:
+        """Insert new transactions as one executemany instead of a unit of work per row"""
+        if records:
+            self.db.execute(insert(model), records)
+        self.db.commit()
+
+    def _extract_chase_account(self, file_path: str) -> str | None:
+        for pattern in CHASE_ACCOUNT_PATTERNS:
+            match = pattern.search(file_path)
             if match:
-                return re.sub(r"\s+", "", match.group())
+                return WHITESPACE.sub("", match.group())
 
         return None
 
+    def read_csv(self, file_path: str) -> pd.DataFrame:
+        """Read CSV file"""
+        return read_chase_csv(file_path)
+
+    def _clean_amount(self, amount: pd.Series) -> pd.Series:
+        """Strip $ signs and commas from amounts and convert to numbers"""
+        if pd.api.types.is_numeric_dtype(amount):
+            return amount
+
+        # two literal replacements with arrow string kernels avoid a regex engine per cell
+        text = pa.array(amount.astype(str), type=pa.string())
+        text = pc.replace_substring(text, pattern="$", replacement="")
+        text = pc.replace_substring(text, pattern=",", replacement="")
+        return pd.to_numeric(
+            pd.Series(text.to_pandas(), index=amount.index), errors="coerce"
+        )
+
     def close(self):
         """Close database connection"""
         if self.db:
@@ -63,13 +151,24 @@ class CSVImporter(ABC):
 
 class BankAccountCSVImporter(CSVImporter):
 
+    def read_csv(self, file_path: str) -> pd.DataFrame:
+        """Read CSV file"""
+        return read_chase_csv(
+            file_path, usecols=range(1, 7)
+        )  # first column is NULL Details
+
     def import_csv(
-        self, file_path: str, column_mapping: dict, dry_run: bool = True
+        self,
+        file_path: str,
+        column_mapping: dict,
+        dry_run: bool = True,
+        df: pd.DataFrame | None = None,
     ) -> pd.DataFrame:
-        """Import CSV with column mapping"""
+        """Import CSV with column mapping, optionally from an already parsed frame"""
 
         # Read CSV
-        df = pd.read_csv(file_path, usecols=range(1, 7))  # first column is NULL Details
+        if df is None:
+            df = self.read_csv(file_path)
         print(f"📥 Loaded {len(df)} rows from {Path(file_path).name}")
 
         # Apply column mapping
@@ -87,31 +186,29 @@ class BankAccountCSVImporter(CSVImporter):
             print(df[["date", "amount", "description"]].head(10).to_string())
             return df
 
-        # Save to database
-        saved_count = 0
-        for _, row in df.iterrows():
-            transaction = BankAccountTransaction(
-                id=self._generate_id(row),
-                date=row["date"],
-                amount=row["amount"],
-                description=row["description"],
-                balance=row["balance"],
-                account=account_number,
-                source_file=Path(file_path).name,
-            )
-
-            # Simple upsert logic
-            existing = (
-                self.db.query(BankAccountTransaction)
-                .filter(BankAccountTransaction.id == transaction.id)
-                .first()
+        # Save to database, skipping transactions already stored or repeated in the file
+        ids = self._generate_ids(df)
+        seen = self._existing_ids(BankAccountTransaction, ids)
+        records = []
+        for transaction_id, row in zip(ids, df.to_dict("records")):
+            if transaction_id in seen:
+                continue
+            seen.add(transaction_id)
+
+            records.append(
+                {
+                    "id": transaction_id,
+                    "date": row["date"],
+                    "amount": row["amount"],
+                    "description": row["description"],
+                    "balance": row["balance"],
+                    "account": account_number,
+                    "source_file": Path(file_path).name,
+                }
             )
-            if not existing:
-                self.db.add(transaction)
-                saved_count += 1
 
-        self.db.commit()
-        print(f"✅ Imported {saved_count} new transactions")
+        self._insert_records(BankAccountTransaction, records)
+        print(f"✅ Imported {len(records)} new transactions")
         return df
 
     def _clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -119,14 +216,11 @@ class BankAccountCSVImporter(CSVImporter):
 
         # Parse dates
         if "date" in df.columns:
-            df["date"] = pd.to_datetime(df["date"])
+            df["date"] = pd.to_datetime(df["date"], format=CHASE_DATE_FORMAT)
 
         # Clean amounts (remove $ signs, commas)
         if "amount" in df.columns:
-            df["amount"] = (
-                df["amount"].astype(str).str.replace(r"[\$,]", "", regex=True)
-            )
-            df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+            df["amount"] = self._clean_amount(df["amount"])
 
         # Fill missing descriptions
         if "description" in df.columns:
@@ -138,12 +232,17 @@ class BankAccountCSVImporter(CSVImporter):
 class CreditCardCSVImporter(CSVImporter):
 
     def import_csv(
-        self, file_path: str, column_mapping: dict, dry_run: bool = True
+        self,
+        file_path: str,
+        column_mapping: dict,
+        dry_run: bool = True,
+        df: pd.DataFrame | None = None,
     ) -> pd.DataFrame:
-        """Import CSV with column mapping"""
+        """Import CSV with column mapping, optionally from an already parsed frame"""
 
         # Read CSV
-        df = pd.read_csv(file_path)
+        if df is None:
+            df = self.read_csv(file_path)
         print(f"📥 Loaded {len(df)} rows from {Path(file_path).name}")
 
         # Apply column mapping
@@ -161,31 +260,29 @@ class CreditCardCSVImporter(CSVImporter):
             print(df[["date", "amount", "description"]].head(10).to_string())
             return df
 
-        # Save to database
-        saved_count = 0
-        for _, row in df.iterrows():
-            transaction = CreditCardTransaction(
-                id=self._generate_id(row),
-                date=row["date"],
-                amount=row["amount"],
-                description=row["description"],
-                category=row.get("category", "Other"),
-                card_number=card_number,
-                source_file=Path(file_path).name,
-            )
-
-            # Simple upsert logic
-            existing = (
-                self.db.query(CreditCardTransaction)
-                .filter(CreditCardTransaction.id == transaction.id)
-                .first()
+        # Save to database, skipping transactions already stored or repeated in the file
+        ids = self._generate_ids(df)
+        seen = self._existing_ids(CreditCardTransaction, ids)
+        records = []
+        for transaction_id, row in zip(ids, df.to_dict("records")):
+            if transaction_id in seen:
+                continue
+            seen.add(transaction_id)
+
+            records.append(
+                {
+                    "id": transaction_id,
+                    "date": row["date"],
+                    "amount": row["amount"],
+                    "description": row["description"],
+                    "category": row.get("category", "Other"),
+                    "card_number": card_number,
+                    "source_file": Path(file_path).name,
+                }
             )
-            if not existing:
-                self.db.add(transaction)
-                saved_count += 1
 
-        self.db.commit()
-        print(f"✅ Imported {saved_count} new transactions")
+        self._insert_records(CreditCardTransaction, records)
+        print(f"✅ Imported {len(records)} new transactions")
         return df
 
     def _clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -193,14 +290,11 @@ class CreditCardCSVImporter(CSVImporter):
 
         # Parse dates
         if "date" in df.columns:
-            df["date"] = pd.to_datetime(df["date"])
+            df["date"] = pd.to_datetime(df["date"], format=CHASE_DATE_FORMAT)
 
         # Clean amounts (remove $ signs, commas)
         if "amount" in df.columns:
-            df["amount"] = (
-                df["amount"].astype(str).str.replace(r"[\$,]", "", regex=True)
-            )
-            df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+            df["amount"] = self._clean_amount(df["amount"])
 
         # Fill missing descriptions
         if "description" in df.columns:
@@ -214,9 +308,13 @@ class CreditCardCSVImporter(CSVImporter):
 
 
 def process_csv_file(
-    importer: CSVImporter, file_path: str, account_type: AccountType, dry_run: bool
+    importer: CSVImporter,
+    file_path: str,
+    account_type: AccountType,
+    dry_run: bool,
+    parsed: Future | None = None,
 ) -> dict:
-    """Process a single CSV file"""
+    """Process a single CSV file, optionally using a parse already in flight"""
     print(f"\n{'='*60}")
     print(f"📄 Processing: {file_path}")
     print(f"{'='*60}")
@@ -238,7 +336,10 @@ def process_csv_file(
         print(f"Column mapping: {column_mapping}")
 
         df = importer.import_csv(
-            str(file_path), column_mapping=column_mapping, dry_run=dry_run
+            str(file_path),
+            column_mapping=column_mapping,
+            dry_run=dry_run,
+            df=parsed.result() if parsed is not None else None,
         )
 
         return {"file": file_path, "status": "success", "rows": len(df), "error": None}
@@ -261,17 +362,14 @@ def process_all_csv_files(
         print(f"❌ Folder does not exist: {folder}")
         return
 
-    # Find all CSV files (case-insensitive)
-    all_csv_files: list = []
-
-    # Handle case-insensitive matching
-    if file_pattern.lower() == "*.csv":
-        # Default case: find both .csv and .CSV files
-        all_csv_files.extend(folder.glob("*.csv"))
-        all_csv_files.extend(folder.glob("*.CSV"))
-
-    # Remove duplicates (in case a file matches multiple patterns)
-    csv_files: list = list(set(all_csv_files))
+    # Find all CSV files (case-insensitive) in one directory scan, so .csv and .CSV
+    # files are matched together and no file can be listed twice
+    pattern = file_pattern.lower()
+    csv_files: list = sorted(
+        Path(entry.path)
+        for entry in os.scandir(folder)
+        if entry.is_file() and fnmatch.fnmatch(entry.name.lower(), pattern)
+    )
 
     if not csv_files:
         print(f"❌ No CSV files found in {folder} matching pattern '{file_pattern}'")
@@ -294,10 +392,16 @@ def process_all_csv_files(
     else:
         raise ValueError(f"Account Type Not Supported: {account_type}")
 
+    # Parsing releases the GIL so files are read concurrently while earlier files are
+    # written to the database, which stays on this thread with the importer's session
     try:
-        for csv_file in csv_files:
-            result = process_csv_file(importer, csv_file, account_type, dry_run)
-            results.append(result)
+        with ThreadPoolExecutor() as pool:
+            parsed = {f: pool.submit(importer.read_csv, str(f)) for f in csv_files}
+            for csv_file in csv_files:
+                result = process_csv_file(
+                    importer, csv_file, account_type, dry_run, parsed[csv_file]
+                )
+                results.append(result)
     finally:
         importer.close()
 
@@ -3,18 +3,20 @@ from etl.layers import raw, staging, marts
 
 class ETLPipeline:
     def __init__(self):
+        # resolved per instance so layer functions patched after import are picked up,
+        # tuples since a layer's steps are fixed once the pipeline is built
         self.layers = {
-            "raw": [raw.import_bank_accounts, raw.import_credit_cards],
-            "staging": [
+            "raw": (raw.import_bank_accounts, raw.import_credit_cards),
+            "staging": (
                 staging.create_staging_bank_account_transactions,
                 staging.create_staging_credit_card_transactions,
-            ],
-            "marts": [
+            ),
+            "marts": (
                 marts.create_transactions_tbl,
                 marts.create_income_tbl,
                 marts.create_savings_tbl,
                 marts.create_spending_tbl,
-            ],
+            ),
         }
 
     def run_layer(self, layer_name: str):
@@ -22,6 +24,15 @@ class ETLPipeline:
         if layer_name not in self.layers:
             raise ValueError(f"Unknown layer: {layer_name}")
 
+        # staging and mart tables are written on one session and committed in a single
+        # transaction per layer
+        if layer_name == "staging":
+            staging.build_all_staging(self.layers[layer_name])
+            return
+        if layer_name == "marts":
+            marts.build_all_marts(self.layers[layer_name])
+            return
+
         for transform_func in self.layers[layer_name]:
             print(f"Running {transform_func.__name__}...")
             transform_func()
@@ -1,46 +1,106 @@
 """Pytest configuration and shared fixtures for the test suite."""
 
 import pytest
+import numpy as np
 import pandas as pd
 import tempfile
+from contextlib import contextmanager
+from datetime import date
 from pathlib import Path
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 from etl.models import Base
 
+# fixed so the cached staging fixtures are reproducible
+FIXED_IMPORTED_AT = pd.Timestamp("2024-01-01T00:00:00")
+
+
+def _create_test_engine():
+    """
+    In-memory SQLite engine with the raw schema created once. pysqlite's own
+    transaction handling is turned off so BEGIN is always emitted, which makes
+    DDL (e.g. to_sql replacing a table) part of the transaction and rolled back.
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@contextmanager
+def _rolled_back_connection(engine):
+    """Connection inside a transaction that is rolled back when the test ends."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    try:
+        yield connection
+    finally:
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture(scope="session")
+def _temp_db_engine():
+    """Engine shared by every temp_db session."""
+    engine = _create_test_engine()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def _temp_db_connection_engine():
+    """Engine shared by every temp_db_connection."""
+    engine = _create_test_engine()
+    yield engine
+    engine.dispose()
+
 
 @pytest.fixture(scope="function")
-def temp_db():
+def temp_db(_temp_db_engine):
     """Create a temporary in-memory SQLite database for testing."""
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    SessionLocal = sessionmaker(bind=engine)
-    session = SessionLocal()
+    with _rolled_back_connection(_temp_db_engine) as connection:
+        # commits inside the test release a SAVEPOINT instead of the outer transaction
+        session = Session(bind=connection, join_transaction_mode="create_savepoint")
 
-    yield session
+        yield session
 
-    session.close()
-    Base.metadata.drop_all(engine)
+        session.close()
 
 
 @pytest.fixture(scope="function")
-def temp_db_connection():
+def temp_db_connection(_temp_db_connection_engine):
     """Create a temporary database connection for pandas operations."""
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    connection = engine.connect()
+    with _rolled_back_connection(_temp_db_connection_engine) as connection:
+        yield connection
 
-    yield connection
 
-    connection.close()
+def _per_test_copy(cached_fixture: str):
+    """Function scoped fixture returning a copy of a session cached frame to modify."""
 
+    @pytest.fixture
+    def fixture(request):
+        return request.getfixturevalue(cached_fixture).copy()
 
-@pytest.fixture
-def sample_bank_transactions_df():
+    return fixture
+
+
+@pytest.fixture(scope="session")
+def _sample_bank_transactions_df_cached():
     """Sample bank account transactions DataFrame for testing."""
     return pd.DataFrame(
         {
-            "date": pd.to_datetime(["2024-01-15", "2024-01-20", "2024-02-01"]),
+            "date": np.array(
+                ["2024-01-15", "2024-01-20", "2024-02-01"], dtype="datetime64[ns]"
+            ),
             "amount": [2500.00, -150.50, -45.00],
             "description": [
                 "CLEARCOVER INC PAYROLL",
@@ -53,12 +113,17 @@ def sample_bank_transactions_df():
     )
 
 
-@pytest.fixture
-def sample_credit_card_transactions_df():
+sample_bank_transactions_df = _per_test_copy("_sample_bank_transactions_df_cached")
+
+
+@pytest.fixture(scope="session")
+def _sample_credit_card_transactions_df_cached():
     """Sample credit card transactions DataFrame for testing."""
     return pd.DataFrame(
         {
-            "date": pd.to_datetime(["2024-01-10", "2024-01-15", "2024-02-05"]),
+            "date": np.array(
+                ["2024-01-10", "2024-01-15", "2024-02-05"], dtype="datetime64[ns]"
+            ),
             "amount": [-12.50, -45.00, -150.00],
             "description": ["SQ *OVATION COFFEE", "WHOLEFDS PRT 10148", "ALASKA AIR"],
             "category": ["Food & Drink", "Groceries", "Travel"],
@@ -66,39 +131,44 @@ def sample_credit_card_transactions_df():
     )
 
 
-@pytest.fixture
-def sample_bank_csv(tmp_path):
-    """Create a sample Chase bank account CSV file."""
+sample_credit_card_transactions_df = _per_test_copy(
+    "_sample_credit_card_transactions_df_cached"
+)
+
+
+@pytest.fixture(scope="session")
+def sample_bank_csv(tmp_path_factory):
+    """Create a sample Chase bank account CSV file, written once and only read by tests."""
     csv_content = """Details,Posting Date,Description,Amount,Type,Balance,Check or Slip #
 DEBIT,01/15/2024,CLEARCOVER INC PAYROLL,2500.00,CREDIT,5000.00,
 DEBIT,01/20/2024,CHASE CREDIT CRD AUTOPAY,-150.50,DEBIT,4849.50,
 DEBIT,02/01/2024,VANGUARD BUY INVESTMENT,-45.00,DEBIT,4804.50,
 """
-    file_path = tmp_path / "Chase1234_bank.csv"
+    file_path = tmp_path_factory.mktemp("bank_csv") / "Chase1234_bank.csv"
     file_path.write_text(csv_content)
     return file_path
 
 
-@pytest.fixture
-def sample_credit_card_csv(tmp_path):
-    """Create a sample Chase credit card CSV file."""
+@pytest.fixture(scope="session")
+def sample_credit_card_csv(tmp_path_factory):
+    """Create a sample Chase credit card CSV file, written once and only read by tests."""
     csv_content = """Transaction Date,Post Date,Description,Category,Type,Amount,Memo
 01/10/2024,01/11/2024,SQ *OVATION COFFEE,Food & Drink,Sale,-12.50,
 01/15/2024,01/16/2024,WHOLEFDS PRT 10148,Groceries,Sale,-45.00,
 02/05/2024,02/06/2024,ALASKA AIR,Travel,Sale,-150.00,
 """
-    file_path = tmp_path / "Chase5678_credit.csv"
+    file_path = tmp_path_factory.mktemp("credit_card_csv") / "Chase5678_credit.csv"
     file_path.write_text(csv_content)
     return file_path
 
 
-@pytest.fixture
-def sample_staging_bank_df():
+@pytest.fixture(scope="session")
+def _sample_staging_bank_df_cached():
     """Sample staging bank account DataFrame with normalized data."""
     return pd.DataFrame(
         {
             "id": ["abc123", "def456", "ghi789"],
-            "date": pd.to_datetime(["2024-01-15", "2024-01-20", "2024-02-01"]).date,
+            "date": [date(2024, 1, 15), date(2024, 1, 20), date(2024, 2, 1)],
             "amount": [2500.00, -150.50, -45.00],
             "description": [
                 "CLEARCOVER INC PAYROLL",
@@ -113,18 +183,21 @@ def sample_staging_bank_df():
             "year_month": ["2024-01", "2024-01", "2024-02"],
             "day_of_week": [1, 6, 4],
             "source_file": ["test.csv", "test.csv", "test.csv"],
-            "imported_at": pd.Timestamp.now(),
+            "imported_at": FIXED_IMPORTED_AT,
         }
     )
 
 
-@pytest.fixture
-def sample_staging_credit_card_df():
+sample_staging_bank_df = _per_test_copy("_sample_staging_bank_df_cached")
+
+
+@pytest.fixture(scope="session")
+def _sample_staging_credit_card_df_cached():
     """Sample staging credit card DataFrame with normalized data."""
     return pd.DataFrame(
         {
             "id": ["xyz123", "xyz456", "xyz789"],
-            "date": pd.to_datetime(["2024-01-10", "2024-01-15", "2024-02-05"]).date,
+            "date": [date(2024, 1, 10), date(2024, 1, 15), date(2024, 2, 5)],
             "amount": [-12.50, -45.00, -150.00],
             "description": ["SQ *OVATION COFFEE", "WHOLEFDS PRT 10148", "ALASKA AIR"],
             "card_number": ["Chase5678", "Chase5678", "Chase5678"],
@@ -135,20 +208,26 @@ def sample_staging_credit_card_df():
             "year_month": ["2024-01", "2024-01", "2024-02"],
             "day_of_week": [3, 1, 1],
             "source_file": ["test.csv", "test.csv", "test.csv"],
-            "imported_at": pd.Timestamp.now(),
+            "imported_at": FIXED_IMPORTED_AT,
         }
     )
 
 
-@pytest.fixture
-def sample_marts_spending_df():
+sample_staging_credit_card_df = _per_test_copy("_sample_staging_credit_card_df_cached")
+
+
+@pytest.fixture(scope="session")
+def _sample_marts_spending_df_cached():
     """Sample marts spending DataFrame for testing metrics."""
     return pd.DataFrame(
         {
             "id": ["s1", "s2", "s3", "s4"],
-            "date": pd.to_datetime(
-                ["2024-01-10", "2024-01-15", "2024-02-05", "2024-02-10"]
-            ).date,
+            "date": [
+                date(2024, 1, 10),
+                date(2024, 1, 15),
+                date(2024, 2, 5),
+                date(2024, 2, 10),
+            ],
             "amount": [12.50, 45.00, 150.00, 100.00],
             "description": ["OVATION COFFEE", "WHOLE FOODS", "ALASKA AIR", "SAFEWAY"],
             "account_or_card_number": [
@@ -168,13 +247,16 @@ def sample_marts_spending_df():
     )
 
 
-@pytest.fixture
-def sample_marts_income_df():
+sample_marts_spending_df = _per_test_copy("_sample_marts_spending_df_cached")
+
+
+@pytest.fixture(scope="session")
+def _sample_marts_income_df_cached():
     """Sample marts income DataFrame for testing metrics."""
     return pd.DataFrame(
         {
             "id": ["i1", "i2"],
-            "date": pd.to_datetime(["2024-01-15", "2024-02-15"]).date,
+            "date": [date(2024, 1, 15), date(2024, 2, 15)],
             "amount": [2500.00, 2500.00],
             "description": ["CLEARCOVER INC PAYROLL", "CLEARCOVER INC PAYROLL"],
             "account_or_card_number": ["Chase1234", "Chase1234"],
@@ -188,13 +270,16 @@ def sample_marts_income_df():
     )
 
 
-@pytest.fixture
-def sample_marts_savings_df():
+sample_marts_income_df = _per_test_copy("_sample_marts_income_df_cached")
+
+
+@pytest.fixture(scope="session")
+def _sample_marts_savings_df_cached():
     """Sample marts savings DataFrame for testing metrics."""
     return pd.DataFrame(
         {
             "id": ["sv1", "sv2"],
-            "date": pd.to_datetime(["2024-01-20", "2024-02-20"]).date,
+            "date": [date(2024, 1, 20), date(2024, 2, 20)],
             "amount": [500.00, 500.00],
             "description": ["VANGUARD BUY INVESTMENT", "VANGUARD BUY INVESTMENT"],
             "account_or_card_number": ["Chase1234", "Chase1234"],
@@ -206,3 +291,6 @@ def sample_marts_savings_df():
             "source": ["bank_account", "bank_account"],
         }
     )
+
+
+sample_marts_savings_df = _per_test_copy("_sample_marts_savings_df_cached")
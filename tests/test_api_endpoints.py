@@ -2,15 +2,49 @@
 
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
 import pandas as pd
 from api.app import app
 
-
-@pytest.fixture
+# return values of the patched metrics functions, shared since endpoints only read them
+SPENDING_BY_CATEGORY = pd.DataFrame(
+    {
+        "meta_category": ["GROCERIES", "TRAVEL"],
+        "avg_monthly_spend": [200.0, 300.0],
+    }
+)
+MONTHLY_BUDGET_HISTORY = pd.DataFrame(
+    {
+        "year_month": ["2024-01", "2024-02"],
+        "monthly_spending": [1000, 1100],
+        "monthly_salary": [2500, 2500],
+    }
+)
+AVERAGE_MONTHLY_BUDGET = pd.DataFrame(
+    {
+        "description": ["GROCERIES", "SALARY"],
+        "amount": [-200, 2500],
+        "category": ["SPENDING", "INCOME"],
+    }
+)
+
+
+@pytest.fixture(scope="module")
 def client():
-    """Create a test client for the FastAPI app."""
-    return TestClient(app)
+    """
+    Create a test client for the FastAPI app, shared by the module since no test
+    changes the app itself (data access is patched per test). Entering the client
+    keeps one event loop thread running for every request instead of starting one
+    per request.
+    """
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def openapi_response(client):
+    """Fetch the generated OpenAPI schema once for the metadata tests."""
+    return client.get("/openapi.json")
 
 
 class TestHealthEndpoint:
@@ -39,176 +73,121 @@ class TestHealthEndpoint:
 class TestSpendingByCategoryEndpoint:
     """Test spending by category endpoint."""
 
-    @patch("api.app.calculate_average_monthly_spending_by_meta_category")
-    def test_spending_by_category_returns_200(self, mock_calculate, client):
-        """Test that spending by category endpoint returns 200."""
-        mock_calculate.return_value = pd.DataFrame(
-            {
-                "meta_category": ["GROCERIES", "TRAVEL"],
-                "avg_monthly_spend": [200.0, 300.0],
-            }
+    @pytest.fixture(autouse=True)
+    def mock_calculate(self, monkeypatch):
+        """Patch the metrics function behind the endpoint for every test."""
+        mock = MagicMock(return_value=SPENDING_BY_CATEGORY)
+        monkeypatch.setattr(
+            "api.app.calculate_average_monthly_spending_by_meta_category", mock
         )
+        return mock
 
-        response = client.get("/api/metrics/spending-by-category")
-        assert response.status_code == 200
-
-    @patch("api.app.calculate_average_monthly_spending_by_meta_category")
     def test_spending_by_category_returns_list(self, mock_calculate, client):
-        """Test that endpoint returns a list of records."""
-        mock_calculate.return_value = pd.DataFrame(
-            {
-                "meta_category": ["GROCERIES", "TRAVEL"],
-                "avg_monthly_spend": [200.0, 300.0],
-            }
-        )
-
+        """Test that endpoint returns 200 with a list of records."""
         response = client.get("/api/metrics/spending-by-category")
+        assert response.status_code == 200
         data = response.json()
 
         assert isinstance(data, list)
         assert len(data) == 2
 
-    @patch("api.app.calculate_average_monthly_spending_by_meta_category")
-    def test_spending_by_category_accepts_period_parameter(
-        self, mock_calculate, client
-    ):
-        """Test that endpoint accepts period parameter."""
-        mock_calculate.return_value = pd.DataFrame(
-            {"meta_category": ["GROCERIES"], "avg_monthly_spend": [200.0]}
-        )
-
-        response = client.get("/api/metrics/spending-by-category?period=last_12_months")
-        assert response.status_code == 200
-
-        # Verify the function was called with correct period
-        mock_calculate.assert_called_once()
-        args = mock_calculate.call_args
-        assert args[0][1] == "last_12_months"  # period parameter
-
-    @patch("api.app.calculate_average_monthly_spending_by_meta_category")
-    def test_spending_by_category_accepts_include_wedding_parameter(
-        self, mock_calculate, client
+    @pytest.mark.parametrize(
+        "query,expected_period,expected_wedding",
+        [
+            ("", "full_history", True),  # defaults
+            ("?period=last_12_months", "last_12_months", True),
+            ("?include_wedding=false", "full_history", False),
+        ],
+    )
+    def test_spending_by_category_passes_parameters(
+        self, mock_calculate, client, query, expected_period, expected_wedding
     ):
-        """Test that endpoint accepts include_wedding parameter."""
-        mock_calculate.return_value = pd.DataFrame(
-            {"meta_category": ["GROCERIES"], "avg_monthly_spend": [200.0]}
-        )
-
-        response = client.get("/api/metrics/spending-by-category?include_wedding=false")
+        """Test that period and include_wedding are passed through with defaults."""
+        response = client.get(f"/api/metrics/spending-by-category{query}")
         assert response.status_code == 200
 
-        # Verify the function was called with correct parameter
         mock_calculate.assert_called_once()
         args = mock_calculate.call_args
-        assert args[0][2] is False  # include_wedding parameter
-
-    @patch("api.app.calculate_average_monthly_spending_by_meta_category")
-    def test_spending_by_category_has_default_parameters(self, mock_calculate, client):
-        """Test that endpoint has correct default parameters."""
-        mock_calculate.return_value = pd.DataFrame(
-            {"meta_category": ["GROCERIES"], "avg_monthly_spend": [200.0]}
-        )
-
-        response = client.get("/api/metrics/spending-by-category")
-        assert response.status_code == 200
-
-        # Verify defaults
-        args = mock_calculate.call_args
-        assert args[0][1] == "full_history"  # default period
-        assert args[0][2] is True  # default include_wedding
+        assert args[0][1] == expected_period  # period parameter
+        assert args[0][2] is expected_wedding  # include_wedding parameter
 
 
 class TestMonthlyBudgetHistoryEndpoint:
     """Test monthly budget history endpoint."""
 
-    @patch("api.app.calculate_monthly_budget_history")
-    def test_monthly_budget_history_returns_200(self, mock_calculate, client):
-        """Test that monthly budget history endpoint returns 200."""
-        mock_calculate.return_value = pd.DataFrame(
-            {
-                "year_month": ["2024-01", "2024-02"],
-                "monthly_spending": [1000, 1100],
-                "monthly_salary": [2500, 2500],
-            }
-        )
-
-        response = client.get("/api/metrics/monthly-budget-history")
-        assert response.status_code == 200
+    @pytest.fixture(autouse=True)
+    def mock_calculate(self, monkeypatch):
+        """Patch the metrics function behind the endpoint for every test."""
+        mock = MagicMock(return_value=MONTHLY_BUDGET_HISTORY)
+        monkeypatch.setattr("api.app.calculate_monthly_budget_history", mock)
+        return mock
 
-    @patch("api.app.calculate_monthly_budget_history")
     def test_monthly_budget_history_returns_list(self, mock_calculate, client):
-        """Test that endpoint returns a list of records."""
-        mock_calculate.return_value = pd.DataFrame(
-            {"year_month": ["2024-01"], "monthly_spending": [1000]}
-        )
-
+        """Test that endpoint returns 200 with a list of records."""
         response = client.get("/api/metrics/monthly-budget-history")
+        assert response.status_code == 200
         data = response.json()
 
         assert isinstance(data, list)
 
-    @patch("api.app.calculate_monthly_budget_history")
-    def test_monthly_budget_history_accepts_parameters(self, mock_calculate, client):
-        """Test that endpoint accepts period and include_wedding parameters."""
-        mock_calculate.return_value = pd.DataFrame(
-            {"year_month": ["2024-01"], "monthly_spending": [1000]}
-        )
-
-        response = client.get(
-            "/api/metrics/monthly-budget-history"
-            "?period=last_6_months&include_wedding=false"
-        )
+    @pytest.mark.parametrize(
+        "query,expected_period,expected_wedding",
+        [
+            ("", "full_history", False),  # defaults
+            (
+                "?period=last_6_months&include_wedding=false",
+                "last_6_months",
+                False,
+            ),
+        ],
+    )
+    def test_monthly_budget_history_passes_parameters(
+        self, mock_calculate, client, query, expected_period, expected_wedding
+    ):
+        """Test that period and include_wedding are passed through with defaults."""
+        response = client.get(f"/api/metrics/monthly-budget-history{query}")
         assert response.status_code == 200
 
         args = mock_calculate.call_args
-        assert args[0][1] == "last_6_months"
-        assert args[0][2] is False
+        assert args[0][1] == expected_period
+        assert args[0][2] is expected_wedding
 
 
 class TestAverageMonthlyBudgetEndpoint:
     """Test average monthly budget endpoint."""
 
-    @patch("api.app.calculate_average_monthly_budget")
-    def test_average_monthly_budget_returns_200(self, mock_calculate, client):
-        """Test that average monthly budget endpoint returns 200."""
-        mock_calculate.return_value = pd.DataFrame(
-            {
-                "description": ["GROCERIES", "SALARY"],
-                "amount": [-200, 2500],
-                "category": ["SPENDING", "INCOME"],
-            }
-        )
-
-        response = client.get("/api/metrics/average-monthly-budget")
-        assert response.status_code == 200
+    @pytest.fixture(autouse=True)
+    def mock_calculate(self, monkeypatch):
+        """Patch the metrics function behind the endpoint for every test."""
+        mock = MagicMock(return_value=AVERAGE_MONTHLY_BUDGET)
+        monkeypatch.setattr("api.app.calculate_average_monthly_budget", mock)
+        return mock
 
-    @patch("api.app.calculate_average_monthly_budget")
     def test_average_monthly_budget_returns_list(self, mock_calculate, client):
-        """Test that endpoint returns a list of records."""
-        mock_calculate.return_value = pd.DataFrame(
-            {"description": ["GROCERIES"], "amount": [-200], "category": ["SPENDING"]}
-        )
-
+        """Test that endpoint returns 200 with a list of records."""
         response = client.get("/api/metrics/average-monthly-budget")
+        assert response.status_code == 200
         data = response.json()
 
         assert isinstance(data, list)
 
-    @patch("api.app.calculate_average_monthly_budget")
-    def test_average_monthly_budget_has_default_parameters(
-        self, mock_calculate, client
+    @pytest.mark.parametrize(
+        "query,expected_period,expected_wedding",
+        [
+            ("", "full_history", False),  # defaults
+            ("?period=ytd&include_wedding=true", "ytd", True),
+        ],
+    )
+    def test_average_monthly_budget_passes_parameters(
+        self, mock_calculate, client, query, expected_period, expected_wedding
     ):
-        """Test that endpoint has correct default parameters."""
-        mock_calculate.return_value = pd.DataFrame(
-            {"description": ["GROCERIES"], "amount": [-200]}
-        )
-
-        response = client.get("/api/metrics/average-monthly-budget")
+        """Test that period and include_wedding are passed through with defaults."""
+        response = client.get(f"/api/metrics/average-monthly-budget{query}")
         assert response.status_code == 200
 
         args = mock_calculate.call_args
-        assert args[0][1] == "full_history"  # default period
-        assert args[0][2] is False  # default include_wedding=False
+        assert args[0][1] == expected_period
+        assert args[0][2] is expected_wedding
 
 
 class TestCORS:
@@ -244,31 +223,29 @@ class TestFrontendEndpoints:
         # Should return HTML file
         assert response.status_code == 200
 
-    def test_static_files_mounted(self, client):
-        """Test that static files are accessible."""
-        # This will fail if frontend/index.html doesn't exist
-        # but tests the routing works
-        response = client.get("/control")
-        assert response.status_code in [200, 404]  # Either exists or doesn't
+    def test_static_files_mounted(self):
+        """Test that the frontend directory is mounted under /static."""
+        # checked on the route table, serving a file is covered by /control above
+        assert any(
+            route.path == "/static" and route.name == "static" for route in app.routes
+        )
 
 
 class TestAPIMetadata:
     """Test API metadata and documentation."""
 
-    def test_api_has_title(self, client):
+    def test_api_has_title(self, openapi_response):
         """Test that API has a title in OpenAPI schema."""
-        response = client.get("/openapi.json")
-        assert response.status_code == 200
-        schema = response.json()
+        assert openapi_response.status_code == 200
+        schema = openapi_response.json()
 
         assert "info" in schema
         assert "title" in schema["info"]
         assert schema["info"]["title"] == "Personal Finance Dashboard"
 
-    def test_api_has_version(self, client):
+    def test_api_has_version(self, openapi_response):
         """Test that API has a version in OpenAPI schema."""
-        response = client.get("/openapi.json")
-        schema = response.json()
+        schema = openapi_response.json()
 
         assert "version" in schema["info"]
         assert schema["info"]["version"] == "0.1.0"
@@ -287,7 +264,15 @@ class TestAPIMetadata:
 class TestErrorHandling:
     """Test error handling in API endpoints."""
 
-    @patch("api.app.calculate_average_monthly_spending_by_meta_category")
+    @pytest.fixture(autouse=True)
+    def mock_calculate(self, monkeypatch):
+        """Patch the metrics function behind the endpoint for every test."""
+        mock = MagicMock(return_value=SPENDING_BY_CATEGORY)
+        monkeypatch.setattr(
+            "api.app.calculate_average_monthly_spending_by_meta_category", mock
+        )
+        return mock
+
     def test_endpoint_handles_database_errors(self, mock_calculate, client):
         """Test that endpoints handle database errors gracefully."""
         # Simulate database error
@@ -298,10 +283,9 @@ class TestErrorHandling:
         with pytest.raises(Exception, match="Database connection error"):
             response = client.get("/api/metrics/spending-by-category")
 
-    @patch("api.app.calculate_average_monthly_spending_by_meta_category")
     def test_endpoint_handles_empty_dataframes(self, mock_calculate, client):
         """Test that endpoints handle empty DataFrames."""
-        mock_calculate.return_value = pd.DataFrame()
+        mock_calculate.return_value = SPENDING_BY_CATEGORY.iloc[0:0]
 
         response = client.get("/api/metrics/spending-by-category")
 
@@ -1,6 +1,7 @@
 """Tests for API metrics calculations."""
 
 import pytest
+from datetime import date
 import pandas as pd
 import numpy as np
 from unittest.mock import patch, MagicMock
@@ -9,6 +10,8 @@ from api.metrics import (
     determine_last_X_months_from_dataset,
     include_wedding_spending,
     subset_data_by_period,
+    sum_amount_by_month,
+    read_mart_table,
     calculate_average_monthly_spending_by_meta_category,
     calculate_monthly_spending,
     calculate_monthly_saving,
@@ -21,67 +24,59 @@ from api.metrics import (
 )
 
 
-class TestDetermineLastXMonths:
-    """Test month subset determination."""
+@pytest.fixture
+def mock_read_sql(monkeypatch):
+    """Replace pd.read_sql so the metrics read marts tables from test frames."""
+    mock = MagicMock()
+    monkeypatch.setattr(pd, "read_sql", mock)
+    return mock
 
-    def test_determine_last_X_months_returns_correct_count(
-        self, sample_marts_spending_df
-    ):
-        """Test that correct number of months are returned."""
-        result = determine_last_X_months_from_dataset(
-            sample_marts_spending_df, number_of_months=1
-        )
-        assert len(result) == 1
 
-        result = determine_last_X_months_from_dataset(
-            sample_marts_spending_df, number_of_months=2
-        )
-        assert len(result) == 2
+@pytest.fixture(scope="module")
+def wedding_df():
+    """
+    Spending with one wedding row, shared since the wedding filter only reads it.
+    meta_category is categorical as read_mart_table returns it.
+    """
+    return pd.DataFrame(
+        {
+            "meta_category": pd.Categorical(
+                ["GROCERIES", "WEDDING", "TRAVEL"],
+                categories=["EATING_OUT", "GROCERIES", "TRAVEL", "WEDDING"],
+            ),
+            "amount": [100, 500, 200],
+        }
+    )
 
-    def test_determine_last_X_months_returns_most_recent(
-        self, sample_marts_spending_df
-    ):
-        """Test that most recent months are returned."""
-        result = determine_last_X_months_from_dataset(
-            sample_marts_spending_df, number_of_months=1
-        )
-        # Should return most recent month (2024-02)
-        assert result[0] == "2024-02"
 
-    def test_determine_last_X_months_sorted_descending(self, sample_marts_spending_df):
-        """Test that months are returned in descending order."""
+class TestDetermineLastXMonths:
+    """Test month subset determination."""
+
+    @pytest.mark.parametrize(
+        "number_of_months,expected",
+        [(1, ["2024-02"]), (2, ["2024-02", "2024-01"])],
+    )
+    def test_determine_last_X_months_returns_most_recent_descending(
+        self, sample_marts_spending_df, number_of_months, expected
+    ):
+        """Test that the requested number of most recent months are returned newest first."""
         result = determine_last_X_months_from_dataset(
-            sample_marts_spending_df, number_of_months=2
+            sample_marts_spending_df, number_of_months=number_of_months
         )
-        assert result[0] == "2024-02"
-        assert result[1] == "2024-01"
+        assert list(result) == expected
 
 
 class TestIncludeWeddingSpending:
     """Test wedding spending filter."""
 
-    def test_include_wedding_spending_keeps_wedding_when_true(self):
+    def test_include_wedding_spending_keeps_wedding_when_true(self, wedding_df):
         """Test that wedding spending is kept when include_wedding=True."""
-        df = pd.DataFrame(
-            {
-                "meta_category": ["GROCERIES", "WEDDING", "TRAVEL"],
-                "amount": [100, 500, 200],
-            }
-        )
-
-        result = include_wedding_spending(df, include_wedding=True)
+        result = include_wedding_spending(wedding_df, include_wedding=True)
         assert len(result) == 3
 
-    def test_include_wedding_spending_removes_wedding_when_false(self):
+    def test_include_wedding_spending_removes_wedding_when_false(self, wedding_df):
         """Test that wedding spending is removed when include_wedding=False."""
-        df = pd.DataFrame(
-            {
-                "meta_category": ["GROCERIES", "WEDDING", "TRAVEL"],
-                "amount": [100, 500, 200],
-            }
-        )
-
-        result = include_wedding_spending(df, include_wedding=False)
+        result = include_wedding_spending(wedding_df, include_wedding=False)
         assert len(result) == 2
         assert "WEDDING" not in result["meta_category"].values
 
@@ -101,25 +96,23 @@ class TestSubsetDataByPeriod:
 
         result = subset_data_by_period(df, period="ytd")
         assert len(result) == 2
-        assert all(result["year"] == 2024)
-
-    def test_subset_data_by_period_last_1_months(self, sample_marts_spending_df):
-        """Test last 1 month subsetting."""
-        result = subset_data_by_period(sample_marts_spending_df, period="last_1_months")
-        # Should only include 2024-02 (most recent month)
-        assert len(result) == 2
-        assert all(result["year_month"] == "2024-02")
-
-    def test_subset_data_by_period_last_3_months(self, sample_marts_spending_df):
-        """Test last 3 months subsetting."""
-        result = subset_data_by_period(sample_marts_spending_df, period="last_3_months")
-        # Only have 2 months of data, so should return all
-        assert len(result) == 4
-
-    def test_subset_data_by_period_full_history(self, sample_marts_spending_df):
-        """Test full history returns all data."""
-        result = subset_data_by_period(sample_marts_spending_df, period="full_history")
-        assert len(result) == len(sample_marts_spending_df)
+        assert (result["year"] == 2024).all()
+
+    @pytest.mark.parametrize(
+        "period,expected_months,expected_rows",
+        [
+            ("last_1_months", {"2024-02"}, 2),  # most recent month only
+            ("last_3_months", {"2024-01", "2024-02"}, 4),  # only 2 months of data
+            ("full_history", {"2024-01", "2024-02"}, 4),
+        ],
+    )
+    def test_subset_data_by_period_last_months(
+        self, sample_marts_spending_df, period, expected_months, expected_rows
+    ):
+        """Test subsetting to the most recent months and the full history."""
+        result = subset_data_by_period(sample_marts_spending_df, period=period)
+        assert len(result) == expected_rows
+        assert set(result["year_month"]) == expected_months
 
     def test_subset_data_by_period_invalid_period_raises_error(
         self, sample_marts_spending_df
@@ -129,10 +122,60 @@ class TestSubsetDataByPeriod:
             subset_data_by_period(sample_marts_spending_df, period="invalid_period")
 
 
+class TestSumAmountByMonth:
+    """Test monthly amount totals."""
+
+    def test_sum_amount_by_month_totals_each_month(self):
+        """Test that amounts are summed per month, unsorted in order of appearance."""
+        df = pd.DataFrame(
+            {
+                "year_month": ["2024-02", "2024-01", "2024-02", "2024-01"],
+                "amount": [10.0, 5.0, 2.5, np.nan],
+            }
+        )
+
+        result = sum_amount_by_month(df, "total", sort=False)
+
+        assert result["year_month"].tolist() == ["2024-02", "2024-01"]
+        assert result["total"].tolist() == [12.5, 5.0]
+
+    def test_sum_amount_by_month_sorted(self):
+        """Test that months are returned in ascending order by default."""
+        df = pd.DataFrame(
+            {"year_month": ["2024-03", "2024-01", "2024-02"], "amount": [3, 1, 2]}
+        )
+
+        result = sum_amount_by_month(df, "total")
+
+        assert result["year_month"].tolist() == ["2024-01", "2024-02", "2024-03"]
+        assert result["total"].tolist() == [1, 2, 3]
+
+
+class TestReadMartTable:
+    """Test reading marts tables."""
+
+    def test_read_mart_table_encodes_low_cardinality_columns(self, mock_read_sql):
+        """Test that category columns are categorical and other columns untouched."""
+        mock_read_sql.return_value = pd.DataFrame(
+            {
+                "year_month": ["2024-01", "2024-02"],
+                "category": ["SALARY", "SALARY"],
+                "amount": [100.0, 200.0],
+            }
+        )
+
+        result = read_mart_table(MagicMock(), "marts_income")
+
+        assert "marts_income" in mock_read_sql.call_args[0][0]
+        assert isinstance(result["category"].dtype, pd.CategoricalDtype)
+        assert result["category"].tolist() == ["SALARY", "SALARY"]
+        assert result["year_month"].dtype == object
+        assert result["amount"].tolist() == [100.0, 200.0]
+
+
 class TestCalculateAverageMonthlySpendingByMetaCategory:
     """Test average monthly spending calculation by meta category."""
 
-    @patch("api.metrics.pd.read_sql")
     def test_calculate_average_monthly_spending_by_meta_category(
         self, mock_read_sql, sample_marts_spending_df
     ):
@@ -154,32 +197,27 @@ class TestCalculateAverageMonthlySpendingByMetaCategory:
         # We have 2 months of data
         assert result["number_of_months_in_sample"].iloc[0] == 2
 
-    @patch("api.metrics.pd.read_sql")
     def test_calculate_average_monthly_spending_excludes_wedding(
         self, mock_read_sql, sample_marts_spending_df
     ):
         """Test that wedding spending can be excluded."""
         # Add wedding spending
-        df_with_wedding = pd.concat(
-            [
-                sample_marts_spending_df,
-                pd.DataFrame(
-                    {
-                        "id": ["w1"],
-                        "date": [pd.Timestamp("2024-01-20").date()],
-                        "amount": [5000],
-                        "description": ["Wedding"],
-                        "account_or_card_number": ["Chase1234"],
-                        "category": ["WEDDING"],
-                        "meta_category": ["WEDDING"],
-                        "year": [2024],
-                        "month": [1],
-                        "year_month": ["2024-01"],
-                        "day_of_week": [6],
-                        "source": ["bank_account"],
-                    }
-                ),
-            ]
+        wedding_row = {
+            "id": "w1",
+            "date": date(2024, 1, 20),
+            "amount": 5000,
+            "description": "Wedding",
+            "account_or_card_number": "Chase1234",
+            "category": "WEDDING",
+            "meta_category": "WEDDING",
+            "year": 2024,
+            "month": 1,
+            "year_month": "2024-01",
+            "day_of_week": 6,
+            "source": "bank_account",
+        }
+        df_with_wedding = pd.DataFrame.from_records(
+            [*sample_marts_spending_df.to_dict("records"), wedding_row]
         )
 
         mock_db = MagicMock()
@@ -196,7 +234,6 @@ class TestCalculateAverageMonthlySpendingByMetaCategory:
 class TestCalculateMonthlySpending:
     """Test monthly spending calculation."""
 
-    @patch("api.metrics.pd.read_sql")
     def test_calculate_monthly_spending(self, mock_read_sql, sample_marts_spending_df):
         """Test monthly spending aggregation."""
         mock_db = MagicMock()
@@ -214,13 +251,12 @@ class TestCalculateMonthlySpending:
         jan_spending = result[result["year_month"] == "2024-01"][
             "monthly_spending"
         ].iloc[0]
-        assert jan_spending == 12.50 + 45.00  # Two Jan transactions
+        assert jan_spending == pytest.approx(12.50 + 45.00)  # Two Jan transactions
 
 
 class TestCalculateMonthlySaving:
     """Test monthly saving calculation."""
 
-    @patch("api.metrics.pd.read_sql")
     def test_calculate_monthly_saving(self, mock_read_sql, sample_marts_savings_df):
         """Test monthly savings aggregation."""
         mock_db = MagicMock()
@@ -233,14 +269,13 @@ class TestCalculateMonthlySaving:
         # Should have entries for both months
         assert len(result) == 2
 
-    @patch("api.metrics.pd.read_sql")
     def test_calculate_monthly_saving_fills_missing_months(self, mock_read_sql):
         """Test that missing months are filled with zeros."""
         # Only have savings in January
         df = pd.DataFrame(
             {
                 "id": ["sv1"],
-                "date": [pd.Timestamp("2024-01-20").date()],
+                "date": [date(2024, 1, 20)],
                 "amount": [500.00],
                 "category": ["TRANSFER_TO_BROKERAGE"],
                 "year": [2024],
@@ -257,7 +292,6 @@ class TestCalculateMonthlySaving:
         # Check that only January has data (no fill since there's only one month)
         assert len(result) == 1
 
-    @patch("api.metrics.pd.read_sql")
     def test_calculate_average_monthly_saving(
         self, mock_read_sql, sample_marts_savings_df
     ):
@@ -275,7 +309,6 @@ class TestCalculateMonthlySaving:
 class TestCalculateMonthlySalary:
     """Test monthly salary calculation."""
 
-    @patch("api.metrics.pd.read_sql")
     def test_calculate_monthly_salary(self, mock_read_sql, sample_marts_income_df):
         """Test monthly salary aggregation."""
         mock_db = MagicMock()
@@ -290,7 +323,16 @@ class TestCalculateMonthlySalary:
         # Check salary amounts
         assert result["monthly_salary"].iloc[0] == 2500.00
 
-    @patch("api.metrics.pd.read_sql")
+    def test_calculate_monthly_salary_sorted_by_month(
+        self, mock_read_sql, sample_marts_income_df
+    ):
+        """Test that monthly salary rows are in ascending year_month order."""
+        mock_read_sql.return_value = sample_marts_income_df.iloc[::-1]
+
+        result = calculate_monthly_salary(MagicMock(), period="full_history")
+
+        assert result["year_month"].tolist() == ["2024-01", "2024-02"]
+
     def test_calculate_average_monthly_salary(
         self, mock_read_sql, sample_marts_income_df
     ):
@@ -308,18 +350,23 @@ class TestCalculateMonthlySalary:
 class TestCalculateAverageMonthlyBudget:
     """Test average monthly budget calculation."""
 
+    @pytest.fixture(scope="class")
+    def spending_mock_df(self):
+        """Average monthly spending returned by the patched spending calculation."""
+        return pd.DataFrame(
+            {"meta_category": ["GROCERIES", "TRAVEL"], "avg_monthly_spend": [200, 300]}
+        )
+
     @patch("api.metrics.calculate_average_monthly_spending_by_meta_category")
     @patch("api.metrics.calculate_average_monthly_salary")
     def test_calculate_average_monthly_budget_includes_spending_and_income(
-        self, mock_salary, mock_spending
+        self, mock_salary, mock_spending, spending_mock_df
     ):
         """Test that budget includes both spending and income."""
-        mock_db = MagicMock()
+        mock_db = object()  # only passed through to the patched calculations
 
         # Mock spending
-        mock_spending.return_value = pd.DataFrame(
-            {"meta_category": ["GROCERIES", "TRAVEL"], "avg_monthly_spend": [200, 300]}
-        )
+        mock_spending.return_value = spending_mock_df
 
         # Mock salary
         mock_salary.return_value = 2500.0
@@ -350,7 +397,7 @@ class TestCalculateAverageMonthlyBudget:
         self, mock_salary, mock_spending
     ):
         """Test that cash flow is correctly calculated."""
-        mock_db = MagicMock()
+        mock_db = object()  # only passed through to the patched calculations
 
         mock_spending.return_value = pd.DataFrame(
             {"meta_category": ["GROCERIES"], "avg_monthly_spend": [200]}
@@ -367,7 +414,7 @@ class TestCalculateAverageMonthlyBudget:
         # Spending = 200
         # Cash flow = 3350 - 200 = 3150
         cash_flow = result[result["category"] == "CASH_FLOW"]["amount"].iloc[0]
-        assert cash_flow == 3350 - 200
+        assert cash_flow == pytest.approx(3350 - 200)
 
 
 class TestCalculateMonthlyBudgetHistory:
@@ -380,7 +427,7 @@ class TestCalculateMonthlyBudgetHistory:
         self, mock_savings, mock_salary, mock_spending
     ):
         """Test that budget history merges spending, salary, and savings."""
-        mock_db = MagicMock()
+        mock_db = object()  # only passed through to the patched calculations
 
         mock_spending.return_value = pd.DataFrame(
             {"year_month": ["2024-01", "2024-02"], "monthly_spending": [500, 600]}
@@ -412,7 +459,6 @@ class TestCalculateMonthlyBudgetHistory:
 class TestCalculateEatingOutByCategory:
     """Test eating out subcategory analysis."""
 
-    @patch("api.metrics.pd.read_sql")
     def test_calculate_average_monthly_spend_eating_out_by_category(
         self, mock_read_sql
     ):
@@ -451,9 +497,8 @@ class TestCalculateEatingOutByCategory:
         assert "WORKDAY" in result.columns
 
         # Check that workday categories are flagged
-        workday_categories = result[result["WORKDAY"] == True]["category"].tolist()
-        assert "OVATION_WEEKDAY" in workday_categories
-        assert "EATING_OUT_NBHD_LUNCH" in workday_categories
+        workday_categories = set(result.loc[result["WORKDAY"], "category"])
+        assert {"OVATION_WEEKDAY", "EATING_OUT_NBHD_LUNCH"} <= workday_categories
 
 
 class TestConstants:
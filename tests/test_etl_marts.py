@@ -10,6 +10,7 @@ from etl.layers.marts import (
     _prepare_bank_account_tx_for_union,
     _prepare_credit_card_tx_for_union,
     create_unified_transactions,
+    partition_transactions_on_savings,
     subset_transactions_on_savings,
     drop_savings_from_tx_tbl,
     drop_income_from_tx_tbl,
@@ -18,8 +19,55 @@ from etl.layers.marts import (
     create_spending_tbl,
     create_income_tbl,
     create_savings_tbl,
+    build_all_marts,
 )
 
+# fixed import time, staging and marts only carry it through
+IMPORTED_AT = pd.Timestamp("2024-01-15T00:00:00")
+
+
+# (category, expected meta category) pairs checked in one batch by TestMetaCategories
+META_CATEGORY_CASES = [
+    ("MORTGAGE_PAYMENT", "HOUSING"),
+    ("HOA_PAYMENT", "HOUSING"),
+    ("WEDDING", "WEDDING"),
+    ("JENNA_WEDDING_ACCT_TRANSFERS", "WEDDING"),
+    ("SPOTIFY_MEMBERSHIP", "ENTERTAINMENT_SUBSCRIPTIONS"),
+    ("HBO_SUBSCRIPTION", "ENTERTAINMENT_SUBSCRIPTIONS"),
+    ("SALARY", "INCOME"),
+    ("TAX_REFUND", "INCOME"),
+    ("CASH_WITHDRAWL", "CASH_WITHDRAWL"),
+    ("CAR_INSURANCE", "INSURANCE"),
+    ("DIAMOND_INSURANCE", "INSURANCE"),
+    ("CELL_PHONE_BILL", "UTILITIES"),
+    ("COMCAST", "UTILITIES"),
+    ("PGE", "UTILITIES"),
+    ("FAST_FOOD", "EATING_OUT"),
+    ("EATING_OUT", "EATING_OUT"),
+    ("OVATION_WEEKDAY", "EATING_OUT"),
+    ("GROCERIES", "GROCERIES"),
+    ("FLIGHTS", "TRAVEL"),
+    ("TRAVEL_LODGING", "TRAVEL"),
+    ("VOD_AMAZON", "MOVIES"),
+    ("MOVIES", "MOVIES"),
+    ("POWELLS", "HOBBY_PHYSICAL_MEDIA"),
+    ("MTG", "HOBBY_PHYSICAL_MEDIA"),
+    ("CONCERTS", "CONCERTS_AND_SPORTING_EVENTS"),
+    ("MODA_CENTER", "CONCERTS_AND_SPORTING_EVENTS"),
+    ("LIQUOR_STORE", "HOBBY_COCKTAILS"),
+    ("GYM_MEMBERSHIP", "HOBBY_SPORTS"),
+    ("INDOOR_SOCCER", "HOBBY_SPORTS"),
+    ("CLOTHES", "CLOTHES"),
+    ("DRY_CLEANING", "CLOTHES"),
+    ("GAS", "CAR"),
+    ("CAR_MAINTENANCE", "CAR"),
+    ("VENMO_PAYMENT", "VENMO"),
+    ("HOSTING_SOFTWARE_PROJECTS", "HOBBY_TECH"),
+    ("COMPUTERS_TECHNOLOGY_HARDWARE", "HOBBY_TECH"),
+    ("AMAZON_PURCHASE", "AMAZON_SPENDING"),
+    ("RANDOM_CATEGORY", "OTHER"),
+]
+
 
 class TestDataPreparation:
     """Test data preparation functions for union operations."""
@@ -34,7 +82,7 @@ class TestDataPreparation:
                 "category": ["SALARY", "CREDIT_CARD_PAYMENT", "GROCERIES"],
                 "balance": [1000, 950, 925],
                 "source_file": ["test.csv", "test.csv", "test.csv"],
-                "imported_at": [pd.Timestamp.now()] * 3,
+                "imported_at": [IMPORTED_AT] * 3,
                 "description": ["Pay", "CC Payment", "Store"],
             }
         )
@@ -64,7 +112,7 @@ class TestDataPreparation:
                 "category": ["GROCERIES", "CREDIT_CARD_PAYMENT"],
                 "chase_category": ["Groceries", "Payment"],
                 "source_file": ["test.csv", "test.csv"],
-                "imported_at": [pd.Timestamp.now()] * 2,
+                "imported_at": [IMPORTED_AT] * 2,
                 "description": ["Store", "Payment"],
             }
         )
@@ -106,7 +154,7 @@ class TestUnifiedTransactions:
                 "category": ["SALARY"],
                 "balance": [5000],
                 "source_file": ["test.csv"],
-                "imported_at": [pd.Timestamp.now()],
+                "imported_at": [IMPORTED_AT],
                 "description": ["Payroll"],
                 "date": [pd.Timestamp("2024-01-15").date()],
                 "year": [2024],
@@ -124,7 +172,7 @@ class TestUnifiedTransactions:
                 "category": ["GROCERIES"],
                 "chase_category": ["Groceries"],
                 "source_file": ["test.csv"],
-                "imported_at": [pd.Timestamp.now()],
+                "imported_at": [IMPORTED_AT],
                 "description": ["Store"],
                 "date": [pd.Timestamp("2024-01-16").date()],
                 "year": [2024],
@@ -153,6 +201,9 @@ class TestUnifiedTransactions:
         assert "source" in result.columns
         assert set(result["source"].unique()) == {"bank_account", "credit_card"}
         assert "account_or_card_number" in result.columns
+        # Low cardinality columns are dictionary encoded
+        assert isinstance(result["source"].dtype, pd.CategoricalDtype)
+        assert isinstance(result["category"].dtype, pd.CategoricalDtype)
 
 
 class TestTransactionFiltering:
@@ -174,13 +225,33 @@ class TestTransactionFiltering:
         result = subset_transactions_on_savings(df)
 
         assert len(result) == 2
-        assert all(result["category"].isin(SAVINGS_CATEGORIES))
+        assert result["category"].isin(SAVINGS_CATEGORIES).all()
         # Check sign flip: transfer to brokerage should be positive (savings increase)
         assert (
             result[result["category"] == "TRANSFER_TO_BROKERAGE"]["amount"].iloc[0]
             == 500
         )
 
+    def test_partition_transactions_on_savings(self):
+        """Test that partitioning matches the separate savings filters."""
+        df = pd.DataFrame(
+            {
+                "amount": [-500, 100, -50, 25],
+                "category": [
+                    "TRANSFER_TO_BROKERAGE",
+                    "SALARY",
+                    "GROCERIES",
+                    "TRANSFER_FROM_BROKERAGE",
+                ],
+            }
+        )
+
+        savings, non_savings = partition_transactions_on_savings(df)
+
+        pd.testing.assert_frame_equal(savings, subset_transactions_on_savings(df))
+        pd.testing.assert_frame_equal(non_savings, drop_savings_from_tx_tbl(df))
+        assert len(savings) + len(non_savings) == len(df)
+
     def test_drop_savings_from_tx_tbl(self):
         """Test that savings transactions are excluded."""
         df = pd.DataFrame(
@@ -210,57 +281,18 @@ class TestTransactionFiltering:
 class TestMetaCategories:
     """Test meta category assignment."""
 
-    @pytest.mark.parametrize(
-        "category,expected_meta",
-        [
-            ("MORTGAGE_PAYMENT", "HOUSING"),
-            ("HOA_PAYMENT", "HOUSING"),
-            ("WEDDING", "WEDDING"),
-            ("JENNA_WEDDING_ACCT_TRANSFERS", "WEDDING"),
-            ("SPOTIFY_MEMBERSHIP", "ENTERTAINMENT_SUBSCRIPTIONS"),
-            ("HBO_SUBSCRIPTION", "ENTERTAINMENT_SUBSCRIPTIONS"),
-            ("SALARY", "INCOME"),
-            ("TAX_REFUND", "INCOME"),
-            ("CASH_WITHDRAWL", "CASH_WITHDRAWL"),
-            ("CAR_INSURANCE", "INSURANCE"),
-            ("DIAMOND_INSURANCE", "INSURANCE"),
-            ("CELL_PHONE_BILL", "UTILITIES"),
-            ("COMCAST", "UTILITIES"),
-            ("PGE", "UTILITIES"),
-            ("FAST_FOOD", "EATING_OUT"),
-            ("EATING_OUT", "EATING_OUT"),
-            ("OVATION_WEEKDAY", "EATING_OUT"),
-            ("GROCERIES", "GROCERIES"),
-            ("FLIGHTS", "TRAVEL"),
-            ("TRAVEL_LODGING", "TRAVEL"),
-            ("VOD_AMAZON", "MOVIES"),
-            ("MOVIES", "MOVIES"),
-            ("POWELLS", "HOBBY_PHYSICAL_MEDIA"),
-            ("MTG", "HOBBY_PHYSICAL_MEDIA"),
-            ("CONCERTS", "CONCERTS_AND_SPORTING_EVENTS"),
-            ("MODA_CENTER", "CONCERTS_AND_SPORTING_EVENTS"),
-            ("LIQUOR_STORE", "HOBBY_COCKTAILS"),
-            ("GYM_MEMBERSHIP", "HOBBY_SPORTS"),
-            ("INDOOR_SOCCER", "HOBBY_SPORTS"),
-            ("CLOTHES", "CLOTHES"),
-            ("DRY_CLEANING", "CLOTHES"),
-            ("GAS", "CAR"),
-            ("CAR_MAINTENANCE", "CAR"),
-            ("VENMO_PAYMENT", "VENMO"),
-            ("HOSTING_SOFTWARE_PROJECTS", "HOBBY_TECH"),
-            ("COMPUTERS_TECHNOLOGY_HARDWARE", "HOBBY_TECH"),
-            ("AMAZON_PURCHASE", "AMAZON_SPENDING"),
-            ("RANDOM_CATEGORY", "OTHER"),
-        ],
-    )
-    def test_assign_categories_to_meta_categories(self, category, expected_meta):
+    def test_assign_categories_to_meta_categories(self):
         """Test that categories are correctly mapped to meta categories."""
-        df = pd.DataFrame({"category": [category], "amount": [100]})
+        categories = [category for category, _ in META_CATEGORY_CASES]
+        df = pd.DataFrame({"category": categories, "amount": 100})
 
         result = assign_categories_to_meta_categories(df)
 
         assert "meta_category" in result.columns
-        assert result["meta_category"].iloc[0] == expected_meta
+        # compared as a mapping so a failure lists just the mismatched categories
+        assert dict(zip(categories, result["meta_category"])) == dict(
+            META_CATEGORY_CASES
+        )
 
     def test_assign_categories_to_meta_categories_handles_multiple_rows(self):
         """Test meta category assignment with multiple transactions."""
@@ -288,11 +320,29 @@ class TestMetaCategories:
             "AMAZON_SPENDING",
         ]
 
+    def test_assign_categories_to_meta_categories_handles_encoded_categories(self):
+        """Test that dictionary encoded and missing categories are assigned."""
+        df = pd.DataFrame(
+            {
+                "category": pd.Categorical(["GROCERIES", None, "GAS", "GROCERIES"]),
+                "amount": [100, 20, 40, 60],
+            }
+        )
+
+        result = assign_categories_to_meta_categories(df)
+
+        assert result["meta_category"].tolist() == [
+            "GROCERIES",
+            "OTHER",
+            "CAR",
+            "GROCERIES",
+        ]
+
 
 class TestMartsTableCreation:
     """Test marts table creation functions."""
 
-    @patch("etl.layers.marts.get_db")
+    @patch("etl.database.get_db")
     @patch("etl.layers.marts.create_unified_transactions")
     def test_create_transactions_tbl(
         self, mock_unified, mock_get_db, temp_db_connection
@@ -325,11 +375,19 @@ class TestMartsTableCreation:
         create_transactions_tbl()
 
         # Verify table was created
-        result = pd.read_sql("SELECT * FROM marts_transactions", temp_db_connection)
-        assert len(result) > 0
-        assert "meta_category" in result.columns
-
-    @patch("etl.layers.marts.get_db")
+        (count,) = temp_db_connection.exec_driver_sql(
+            "SELECT COUNT(*) FROM marts_transactions"
+        ).fetchone()
+        columns = {
+            row[1]
+            for row in temp_db_connection.exec_driver_sql(
+                "PRAGMA table_info(marts_transactions)"
+            )
+        }
+        assert count > 0
+        assert "meta_category" in columns
+
+    @patch("etl.database.get_db")
     @patch("etl.layers.marts.create_unified_transactions")
     def test_create_spending_tbl_excludes_income(
         self, mock_unified, mock_get_db, temp_db_connection
@@ -357,14 +415,13 @@ class TestMartsTableCreation:
 
         create_spending_tbl()
 
-        result = pd.read_sql("SELECT * FROM marts_spending", temp_db_connection)
-        # Only GROCERIES should remain
-        assert len(result) == 1
-        assert result["category"].iloc[0] == "GROCERIES"
-        # Amount should be positive (spending flipped from negative)
-        assert result["amount"].iloc[0] == 100
+        rows = temp_db_connection.exec_driver_sql(
+            "SELECT category, amount FROM marts_spending"
+        ).fetchall()
+        # Only GROCERIES should remain, flipped from negative to a positive amount
+        assert rows == [("GROCERIES", 100)]
 
-    @patch("etl.layers.marts.get_db")
+    @patch("etl.database.get_db")
     @patch("etl.layers.marts.create_unified_transactions")
     def test_create_income_tbl_only_includes_income(
         self, mock_unified, mock_get_db, temp_db_connection
@@ -392,12 +449,14 @@ class TestMartsTableCreation:
 
         create_income_tbl()
 
-        result = pd.read_sql("SELECT * FROM marts_income", temp_db_connection)
+        rows = temp_db_connection.exec_driver_sql(
+            "SELECT category FROM marts_income"
+        ).fetchall()
         # Only SALARY and TAX_REFUND should remain
-        assert len(result) == 2
-        assert set(result["category"].unique()) == {"SALARY", "TAX_REFUND"}
+        assert len(rows) == 2
+        assert {category for (category,) in rows} == {"SALARY", "TAX_REFUND"}
 
-    @patch("etl.layers.marts.get_db")
+    @patch("etl.database.get_db")
     @patch("etl.layers.marts.create_unified_transactions")
     def test_create_savings_tbl_only_includes_savings(
         self, mock_unified, mock_get_db, temp_db_connection
@@ -425,12 +484,76 @@ class TestMartsTableCreation:
 
         create_savings_tbl()
 
-        result = pd.read_sql("SELECT * FROM marts_savings", temp_db_connection)
-        # Only TRANSFER_TO_BROKERAGE should remain
-        assert len(result) == 1
-        assert result["category"].iloc[0] == "TRANSFER_TO_BROKERAGE"
-        # Amount should be positive (savings increase)
-        assert result["amount"].iloc[0] == 500
+        rows = temp_db_connection.exec_driver_sql(
+            "SELECT category, amount FROM marts_savings"
+        ).fetchall()
+        # Only TRANSFER_TO_BROKERAGE should remain, positive as a savings increase
+        assert rows == [("TRANSFER_TO_BROKERAGE", 500)]
+
+    @patch("etl.database.get_db")
+    def test_create_savings_tbl_leaves_shared_session_open(
+        self, mock_get_db, temp_db_connection
+    ):
+        """Test that a builder given a session neither commits nor closes it."""
+        savings = pd.DataFrame(
+            {"id": ["1"], "amount": [500], "category": ["TRANSFER_TO_BROKERAGE"]}
+        )
+        shared_db = MagicMock()
+        shared_db.connection.return_value = temp_db_connection
+
+        create_savings_tbl((savings, savings.iloc[0:0]), db=shared_db)
+
+        (count,) = temp_db_connection.exec_driver_sql(
+            "SELECT COUNT(*) FROM marts_savings"
+        ).fetchone()
+        assert count == 1
+        shared_db.commit.assert_not_called()
+        shared_db.close.assert_not_called()
+        mock_get_db.assert_not_called()
+
+    def test_builders_scope_copy_on_write_to_their_run(self):
+        """Test that copy-on-write is on while a builder runs and restored after."""
+        savings = pd.DataFrame(
+            {"id": ["1"], "amount": [500], "category": ["TRANSFER_TO_BROKERAGE"]}
+        )
+        modes = []
+
+        with patch(
+            "etl.layers.marts.write_table",
+            side_effect=lambda *_: modes.append(pd.get_option("mode.copy_on_write")),
+        ):
+            create_savings_tbl((savings, savings.iloc[0:0]), db=MagicMock())
+
+        assert modes == [True]
+        assert pd.get_option("mode.copy_on_write") is False
+
+    @patch("etl.database.get_db")
+    @patch("etl.layers.marts.create_unified_transactions")
+    def test_build_all_marts_shares_one_session(self, mock_unified, mock_get_db):
+        """Test that all builders run on one session and one partition, committed once."""
+        mock_db = MagicMock()
+        mock_get_db.return_value = mock_db
+        mock_unified.return_value = pd.DataFrame(
+            {
+                "amount": [-500.0, -100.0],
+                "category": ["TRANSFER_TO_BROKERAGE", "GROCERIES"],
+            }
+        )
+        builders = [MagicMock(), MagicMock()]
+        for i, builder in enumerate(builders):
+            builder.__name__ = f"builder_{i}"
+
+        build_all_marts(builders)
+
+        mock_unified.assert_called_once_with(mock_db)
+        partitions = builders[0].call_args.kwargs["partitions"]
+        assert partitions[0]["category"].tolist() == ["TRANSFER_TO_BROKERAGE"]
+        assert partitions[1]["category"].tolist() == ["GROCERIES"]
+        for builder in builders:
+            builder.assert_called_once_with(partitions=partitions, db=mock_db)
+        mock_get_db.assert_called_once()
+        mock_db.commit.assert_called_once()
+        mock_db.close.assert_called_once()
 
 
 class TestConstants:
@@ -438,12 +561,12 @@ class TestConstants:
 
     def test_income_categories_defined(self):
         """Test that INCOME_CATEGORIES constant is defined."""
-        assert isinstance(INCOME_CATEGORIES, list)
+        assert isinstance(INCOME_CATEGORIES, frozenset)
         assert len(INCOME_CATEGORIES) > 0
         assert "SALARY" in INCOME_CATEGORIES
 
     def test_savings_categories_defined(self):
         """Test that SAVINGS_CATEGORIES constant is defined."""
-        assert isinstance(SAVINGS_CATEGORIES, list)
+        assert isinstance(SAVINGS_CATEGORIES, frozenset)
         assert len(SAVINGS_CATEGORIES) > 0
         assert "TRANSFER_TO_BROKERAGE" in SAVINGS_CATEGORIES
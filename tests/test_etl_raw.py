@@ -4,11 +4,13 @@ import pytest
 import pandas as pd
 from pathlib import Path
 from unittest.mock import patch, MagicMock
+from sqlalchemy import func, select
 from etl.layers.raw import (
     CSVImporter,
     BankAccountCSVImporter,
     CreditCardCSVImporter,
     process_csv_file,
+    process_all_csv_files,
     import_bank_accounts,
     import_credit_cards,
 )
@@ -17,6 +19,11 @@ from etl.models import BankAccountTransaction, CreditCardTransaction
 from etl.mappings import get_chase_bank_account_mapping, get_chase_credit_card_mapping
 
 
+def _count_rows(db, model) -> int:
+    """Row count of model's table as a plain SELECT COUNT(*), without an ORM query"""
+    return db.scalar(select(func.count()).select_from(model.__table__))
+
+
 class TestCSVImporter:
     """Test base CSVImporter abstract class methods."""
 
@@ -120,6 +127,25 @@ class TestBankAccountCSVImporter:
         assert pd.api.types.is_numeric_dtype(cleaned["amount"])
         importer.close()
 
+    def test_clean_data_coerces_unparseable_amounts(self, temp_db):
+        """Test that amounts which are not numbers become NaN."""
+        importer = BankAccountCSVImporter()
+        importer.db = temp_db
+
+        df = pd.DataFrame(
+            {
+                "date": ["01/15/2024", "01/16/2024"],
+                "amount": ["-$2,500.00", "pending"],
+                "description": ["Test", "Test"],
+            }
+        )
+
+        cleaned = importer._clean_data(df)
+
+        assert cleaned["amount"].iloc[0] == -2500.00
+        assert pd.isna(cleaned["amount"].iloc[1])
+        importer.close()
+
     def test_clean_data_fills_missing_descriptions(self, temp_db):
         """Test that missing descriptions are filled."""
         importer = BankAccountCSVImporter()
@@ -134,6 +160,24 @@ class TestBankAccountCSVImporter:
         assert cleaned["description"].iloc[0] == "No description"
         importer.close()
 
+    def test_read_csv_handles_trailing_delimiter(self, temp_db, tmp_path):
+        """Test that rows wider than the header keep their column alignment."""
+        importer = BankAccountCSVImporter()
+        importer.db = temp_db
+
+        file_path = tmp_path / "Chase1234_bank.csv"
+        file_path.write_text(
+            "Details,Posting Date,Description,Amount,Type,Balance,Check or Slip #\n"
+            "DEBIT,01/15/2024,CLEARCOVER INC PAYROLL,2500.00,CREDIT,5000.00,,\n"
+        )
+
+        df = importer.read_csv(str(file_path))
+
+        assert "Details" not in df.columns
+        assert df["Posting Date"].iloc[0] == "01/15/2024"
+        assert df["Balance"].iloc[0] == 5000.00
+        importer.close()
+
     def test_import_csv_dry_run_does_not_save(self, temp_db, sample_bank_csv):
         """Test that dry run mode doesn't save to database."""
         importer = BankAccountCSVImporter()
@@ -144,7 +188,7 @@ class TestBankAccountCSVImporter:
 
         assert len(df) > 0
         # Check that nothing was saved to database
-        count = temp_db.query(BankAccountTransaction).count()
+        count = _count_rows(temp_db, BankAccountTransaction)
         assert count == 0
         importer.close()
 
@@ -157,7 +201,7 @@ class TestBankAccountCSVImporter:
         df = importer.import_csv(str(sample_bank_csv), column_mapping, dry_run=False)
 
         assert len(df) > 0
-        count = temp_db.query(BankAccountTransaction).count()
+        count = _count_rows(temp_db, BankAccountTransaction)
         assert count == len(df)
         importer.close()
 
@@ -170,15 +214,51 @@ class TestBankAccountCSVImporter:
 
         # Import first time
         df1 = importer.import_csv(str(sample_bank_csv), column_mapping, dry_run=False)
-        count1 = temp_db.query(BankAccountTransaction).count()
+        count1 = _count_rows(temp_db, BankAccountTransaction)
 
         # Import second time
         df2 = importer.import_csv(str(sample_bank_csv), column_mapping, dry_run=False)
-        count2 = temp_db.query(BankAccountTransaction).count()
+        count2 = _count_rows(temp_db, BankAccountTransaction)
 
         assert count1 == count2  # No new records added
         importer.close()
 
+    def test_import_csv_saves_repeated_rows_once(self, temp_db, tmp_path):
+        """Test that identical rows within one file are stored a single time."""
+        importer = BankAccountCSVImporter()
+        importer.db = temp_db
+
+        file_path = tmp_path / "Chase1234_bank.csv"
+        file_path.write_text(
+            "Details,Posting Date,Description,Amount,Type,Balance,Check or Slip #\n"
+            "DEBIT,01/20/2024,VENMO PAYMENT,-20.00,DEBIT,4980.00,\n"
+            "DEBIT,01/20/2024,VENMO PAYMENT,-20.00,DEBIT,4960.00,\n"
+            "DEBIT,01/21/2024,VENMO PAYMENT,-20.00,DEBIT,4940.00,\n"
+        )
+
+        importer.import_csv(
+            str(file_path), get_chase_bank_account_mapping(), dry_run=False
+        )
+
+        balances = [t.balance for t in temp_db.query(BankAccountTransaction)]
+        assert sorted(balances) == [4940, 4980]  # first of the repeated rows is kept
+        importer.close()
+
+    def test_import_csv_stores_row_values(self, temp_db, sample_bank_csv):
+        """Test that imported rows keep their values and get an import timestamp."""
+        importer = BankAccountCSVImporter()
+        importer.db = temp_db
+
+        df = importer.import_csv(
+            str(sample_bank_csv), get_chase_bank_account_mapping(), dry_run=False
+        )
+
+        stored = temp_db.query(BankAccountTransaction).all()
+        assert sorted(t.description for t in stored) == sorted(df["description"])
+        assert all(t.source_file == sample_bank_csv.name for t in stored)
+        assert all(t.imported_at is not None for t in stored)
+        importer.close()
+
 
 class TestCreditCardCSVImporter:
     """Test credit card CSV import functionality."""
@@ -209,7 +289,7 @@ class TestCreditCardCSVImporter:
         )
 
         assert len(df) > 0
-        count = temp_db.query(CreditCardTransaction).count()
+        count = _count_rows(temp_db, CreditCardTransaction)
         assert count == 0
         importer.close()
 
@@ -224,7 +304,7 @@ class TestCreditCardCSVImporter:
         )
 
         assert len(df) > 0
-        count = temp_db.query(CreditCardTransaction).count()
+        count = _count_rows(temp_db, CreditCardTransaction)
         assert count == len(df)
         importer.close()
 
@@ -239,17 +319,35 @@ class TestCreditCardCSVImporter:
         df1 = importer.import_csv(
             str(sample_credit_card_csv), column_mapping, dry_run=False
         )
-        count1 = temp_db.query(CreditCardTransaction).count()
+        count1 = _count_rows(temp_db, CreditCardTransaction)
 
         # Import second time
         df2 = importer.import_csv(
             str(sample_credit_card_csv), column_mapping, dry_run=False
         )
-        count2 = temp_db.query(CreditCardTransaction).count()
+        count2 = _count_rows(temp_db, CreditCardTransaction)
 
         assert count1 == count2
         importer.close()
 
+    def test_import_csv_reads_header_with_byte_order_mark(
+        self, temp_db, sample_credit_card_csv, tmp_path
+    ):
+        """Test that a CSV saved with a byte order mark still maps its first column."""
+        importer = CreditCardCSVImporter()
+        importer.db = temp_db
+
+        bom_csv = tmp_path / "Chase5678_bom.csv"
+        bom_csv.write_text(sample_credit_card_csv.read_text(), encoding="utf-8-sig")
+
+        df = importer.import_csv(
+            str(bom_csv), get_chase_credit_card_mapping(), dry_run=True
+        )
+
+        assert pd.api.types.is_datetime64_any_dtype(df["date"])
+        assert df["date"].iloc[0] == pd.Timestamp("2024-01-10")
+        importer.close()
+
 
 class TestProcessCSVFile:
     """Test CSV file processing functions."""
@@ -322,3 +420,25 @@ DEBIT,01/15/2024,TEST TRANSACTION,100.00,DEBIT,1000.00,
                 import_bank_accounts(dry_run=True)
             except Exception as e:
                 pytest.fail(f"import_bank_accounts raised exception: {e}")
+
+    @patch("etl.layers.raw.get_db")
+    def test_process_all_csv_files_matches_extension_case_insensitively(
+        self, mock_get_db, temp_db, tmp_path, capsys
+    ):
+        """Test that .csv and .CSV files are each found once and other files ignored."""
+        mock_get_db.return_value = temp_db
+
+        csv_content = """Details,Posting Date,Description,Amount,Type,Balance,Check or Slip #
+DEBIT,01/15/2024,TEST TRANSACTION,100.00,DEBIT,1000.00,
+"""
+        (tmp_path / "lower.csv").write_text(csv_content)
+        (tmp_path / "UPPER.CSV").write_text(csv_content)
+        (tmp_path / "notes.txt").write_text("not a csv")
+        (tmp_path / "nested.csv").mkdir()
+
+        process_all_csv_files(str(tmp_path), AccountType.BANK_ACCOUNT, dry_run=True)
+
+        output = capsys.readouterr().out
+        assert "Found 2 CSV files" in output
+        assert "Successful: 2 files" in output
+        assert "notes.txt" not in output
@@ -17,8 +17,12 @@ from etl.layers.staging import (
     clean_credit_card_data,
     create_staging_bank_account_transactions,
     create_staging_credit_card_transactions,
+    build_all_staging,
 )
 
+# fixed import time, staging and marts only carry it through
+IMPORTED_AT = pd.Timestamp("2024-01-15T00:00:00")
+
 
 class TestNormalizeDescription:
     """Test description normalization."""
@@ -50,6 +54,33 @@ class TestNormalizeDescription:
         assert result["description"].iloc[0] == "TEST"
         assert result["description"].iloc[1] == "TEST"
 
+    def test_normalize_description_collapses_unicode_whitespace(self):
+        """Test that non-breaking and other unicode spaces collapse like ASCII ones."""
+        df = pd.DataFrame(
+            {"description": ["test\xa0\xa0transaction", " another\x1ftest\x85"]},
+            index=[5, 3],
+        )
+
+        result = _normalize_description(df)
+
+        assert result["description"].tolist() == ["TEST TRANSACTION", "ANOTHER TEST"]
+
+    def test_normalize_description_keeps_arrow_string_dtype(self):
+        """Test that arrow backed descriptions stay arrow backed with missing values."""
+        df = pd.DataFrame(
+            {
+                "description": pd.Series(
+                    [" sq  *ovation ", None], dtype="string[pyarrow]"
+                )
+            }
+        )
+
+        result = _normalize_description(df)
+
+        assert result["description"].dtype == "string[pyarrow]"
+        assert result["description"].iloc[0] == "SQ *OVATION"
+        assert pd.isna(result["description"].iloc[1])
+
 
 class TestNormalizeDate:
     """Test date normalization and temporal column creation."""
@@ -88,6 +119,21 @@ class TestNormalizeDate:
         assert result["month"].iloc[1] == 12
         assert result["year_month"].iloc[1] == "2024-12"
 
+    def test_normalize_date_year_month_for_repeated_months(self):
+        """Test that year_month is formatted per row when months repeat out of order."""
+        df = pd.DataFrame(
+            {"date": ["2024-03-01", "2023-11-30", "2024-03-31", "2023-11-01"]}
+        )
+
+        result = _normalize_date(df)
+
+        assert result["year_month"].tolist() == [
+            "2024-03",
+            "2023-11",
+            "2024-03",
+            "2023-11",
+        ]
+
     def test_normalize_date_day_of_week_monday_is_1(self):
         """Test that day_of_week starts with Monday=1."""
         # 2024-01-15 is a Monday
@@ -162,6 +208,46 @@ class TestCategorizeBankTransactions:
         assert result["category"].iloc[1] == "TRANSFER_TO_BROKERAGE"
         assert result["category"].iloc[2] == "OTHER"
 
+    def test_categorize_all_bank_transactions_matches_individual_rules(self):
+        """Test that column categorization keeps rule priority and exact matches."""
+        descriptions = [
+            "WITHDRAWAL 07/14",
+            "ATM WITHDRAWAL 07/14",
+            "INTEREST PAYMENT",
+            "INTEREST PAYMENT REVERSAL",
+            "CHECK # 1976 PASSPORTSERVICES PAYMENT ARC ID",
+        ]
+
+        result = _categorize_all_bank_transactions(
+            pd.DataFrame({"description": descriptions + [None]})
+        )
+
+        assert result["category"].tolist() == [
+            _categorize_individual_bank_transaction(d) for d in descriptions
+        ] + ["OTHER"]
+
+    def test_categorize_all_bank_transactions_repeated_descriptions(self):
+        """Test that repeated descriptions each keep their own row's category."""
+        descriptions = [
+            "VENMO PAYMENT 123",
+            "INTEREST PAYMENT",
+            None,
+            "VENMO PAYMENT 123",
+            "INTEREST PAYMENT",
+        ]
+
+        result = _categorize_all_bank_transactions(
+            pd.DataFrame({"description": descriptions}, index=[10, 11, 12, 13, 14])
+        )
+
+        assert result["category"].tolist() == [
+            "VENMO_PAYMENT",
+            "ACCOUNT_INTEREST",
+            "OTHER",
+            "VENMO_PAYMENT",
+            "ACCOUNT_INTEREST",
+        ]
+
 
 class TestCategorizeCreditCardTransactions:
     """Test credit card transaction categorization."""
@@ -244,6 +330,26 @@ class TestCategorizeCreditCardTransactions:
         assert result["category"].iloc[1] == "GROCERIES"
         assert result["category"].iloc[2] == "FLIGHTS"
 
+    def test_categorize_all_credit_cards_transactions_matches_individual_rules(self):
+        """Test that column categorization keeps rule priority and exact matches."""
+        descriptions = [
+            "AMAZON PRIME",
+            "AMAZON WEB SERVICES",
+            "AMZN MKTP US",
+            "PORTLAND GENERAL ELECTRIC",
+            "PORTLAND GENERAL ELECTRIC AUTOPAY",
+            "SQ *OVATION COFFEE SHELL",
+            "AIRBNB * HMPSDMXX99",
+        ]
+
+        result = _categorize_all_credit_cards_transactions(
+            pd.DataFrame({"description": descriptions})
+        )
+
+        assert result["category"].tolist() == [
+            _categorize_individual_credit_card_transaction(d) for d in descriptions
+        ]
+
     def test_rename_chase_category_col(self):
         """Test that Chase category column is renamed."""
         df = pd.DataFrame({"category": ["Food & Drink", "Groceries"]})
@@ -284,6 +390,33 @@ class TestCategorizeCreditCardTransactions:
         assert result["category"].iloc[0] == "EATING_OUT"
         assert result["category"].iloc[1] == "OTHER"
 
+    def test_credit_card_categories_are_categorical_with_overrides(self):
+        """Test that categories stay categorical through the override step."""
+        df = pd.DataFrame(
+            {
+                "description": ["SQ *OVATION COFFEE", "RANDOM SHOP", "AMAZON"],
+                "day_of_week": [6, 1, 1],
+                "chase_category": ["Food & Drink", "Food & Drink", "Shopping"],
+            }
+        )
+
+        categorized = _categorize_all_credit_cards_transactions(df)
+        result = _update_credit_card_transactions_categories(categorized)
+
+        assert isinstance(categorized["category"].dtype, pd.CategoricalDtype)
+        assert isinstance(result["category"].dtype, pd.CategoricalDtype)
+        assert result["category"].tolist() == [
+            "OVATION_WEEKEND",
+            "EATING_OUT",
+            "AMAZON_PURCHASE",
+        ]
+        # the input frame is left untouched
+        assert categorized["category"].tolist() == [
+            "OVATION",
+            "OTHER",
+            "AMAZON_PURCHASE",
+        ]
+
 
 class TestStagingDataCleaningPipeline:
     """Test complete staging layer data cleaning pipeline."""
@@ -307,7 +440,7 @@ class TestStagingDataCleaningPipeline:
                 "balance": [5000.00],
                 "account": ["Chase1234"],
                 "source_file": ["test.csv"],
-                "imported_at": [pd.Timestamp.now()],
+                "imported_at": [IMPORTED_AT],
             }
         )
 
@@ -348,7 +481,7 @@ class TestStagingDataCleaningPipeline:
                 "category": ["Food & Drink"],
                 "card_number": ["Chase5678"],
                 "source_file": ["test.csv"],
-                "imported_at": [pd.Timestamp.now()],
+                "imported_at": [IMPORTED_AT],
             }
         )
 
@@ -378,7 +511,7 @@ class TestStagingDataCleaningPipeline:
 class TestStagingTableCreation:
     """Test staging table creation functions."""
 
-    @patch("etl.layers.staging.get_db")
+    @patch("etl.database.get_db")
     @patch("etl.layers.staging.clean_bank_account_data")
     def test_create_staging_bank_account_transactions_writes_to_db(
         self, mock_clean, mock_get_db, temp_db_connection
@@ -399,7 +532,7 @@ class TestStagingTableCreation:
                 "year_month": ["2024-01"],
                 "day_of_week": [1],
                 "source_file": ["test.csv"],
-                "imported_at": [pd.Timestamp.now()],
+                "imported_at": [IMPORTED_AT],
             }
         )
 
@@ -418,7 +551,7 @@ class TestStagingTableCreation:
         assert len(result) == 1
         assert result["category"].iloc[0] == "SALARY"
 
-    @patch("etl.layers.staging.get_db")
+    @patch("etl.database.get_db")
     @patch("etl.layers.staging.clean_credit_card_data")
     def test_create_staging_credit_card_transactions_writes_to_db(
         self, mock_clean, mock_get_db, temp_db_connection
@@ -438,7 +571,7 @@ class TestStagingTableCreation:
                 "year_month": ["2024-01"],
                 "day_of_week": [1],
                 "source_file": ["test.csv"],
-                "imported_at": [pd.Timestamp.now()],
+                "imported_at": [IMPORTED_AT],
             }
         )
 
@@ -453,3 +586,43 @@ class TestStagingTableCreation:
         )
         assert len(result) == 1
         assert result["category"].iloc[0] == "OVATION_WEEKDAY"
+
+    @patch("etl.database.get_db")
+    @patch("etl.layers.staging.clean_bank_account_data")
+    def test_create_staging_table_leaves_shared_session_open(
+        self, mock_clean, mock_get_db, temp_db_connection
+    ):
+        """Test that a caller's session is used without committing or closing it."""
+        mock_clean.return_value = pd.DataFrame(
+            {"description": ["CLEARCOVER INC PAYROLL"], "category": ["SALARY"]}
+        )
+        shared_db = MagicMock()
+        shared_db.connection.return_value = temp_db_connection
+
+        create_staging_bank_account_transactions(db=shared_db)
+
+        mock_clean.assert_called_once_with(shared_db)
+        mock_get_db.assert_not_called()
+        shared_db.commit.assert_not_called()
+        shared_db.close.assert_not_called()
+        result = pd.read_sql(
+            "SELECT * FROM staging_bank_account_transactions", temp_db_connection
+        )
+        assert result["category"].tolist() == ["SALARY"]
+
+    @patch("etl.database.get_db")
+    def test_build_all_staging_shares_one_session(self, mock_get_db):
+        """Test that all builders run on one session committed once."""
+        mock_db = MagicMock()
+        mock_get_db.return_value = mock_db
+        builders = [MagicMock(), MagicMock()]
+        for i, builder in enumerate(builders):
+            builder.__name__ = f"builder_{i}"
+
+        build_all_staging(builders)
+
+        for builder in builders:
+            builder.assert_called_once_with(db=mock_db)
+        mock_get_db.assert_called_once()
+        mock_db.commit.assert_called_once()
+        mock_db.close.assert_called_once()